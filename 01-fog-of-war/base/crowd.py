@@ -0,0 +1,189 @@
+"""
+Many ghosts, updated all at once with NumPy.
+
+A GhostCrowd keeps the positions, velocities and goals of all its ghosts in
+arrays, and does what Ghost.logic does for each ghost with a few array
+operations for the whole crowd. The ghosts are GhostViews, that read their data
+in the arrays, so that they can still be drawn and sorted with the other objects.
+To draw many ghosts, GhostCrowd.draw is faster, as it blits them all at once.
+
+Usage:
+    crowd = GhostCrowd(2000)
+    ...
+    # Each frame:
+    crowd.logic()
+    crowd.draw(screen, fov.visible)  # Only the ghosts in the field of view.
+"""
+
+from typing import List
+
+import numpy as np
+import pygame
+
+from .fov import CELL_SIZE
+from .objects import SCREEN, TAN_22_5, Ghost
+from .utils import load_frames
+
+__all__ = ["GhostCrowd", "GhostView"]
+
+
+def octants(x: np.ndarray, y: np.ndarray) -> np.ndarray:
+    """Vectorized objects.octant(): the frame of 8 directional sprites for each direction."""
+    ax = np.abs(x)
+    ay = np.abs(y)
+    horizontal = ay <= ax * TAN_22_5
+    vertical = ax <= ay * TAN_22_5
+    down = y > 0
+    right = x > 0
+
+    diagonal = np.where(down, np.where(right, 1, 7), np.where(right, 3, 5))
+    frames = np.where(vertical, np.where(down, 0, 4), diagonal)
+    return np.where(horizontal, np.where(x >= 0, 2, 6), frames)
+
+
+class GhostView:
+    """A Ghost-like object that reads the data of one ghost of a GhostCrowd."""
+
+    __slots__ = ("crowd", "index")
+
+    def __init__(self, crowd: "GhostCrowd", index: int):
+        self.crowd = crowd
+        self.index = index
+
+    def __str__(self):
+        return f"<GhostView({self.index}, pos={self.pos})>"
+
+    @property
+    def pos(self):
+        return pygame.Vector2(self.crowd.positions[self.index].tolist())
+
+    @property
+    def velocity(self):
+        return pygame.Vector2(self.crowd.velocities[self.index].tolist())
+
+    @property
+    def size(self):
+        return pygame.Vector2(self.crowd.size)
+
+    @property
+    def rect(self):
+        return pygame.Rect(self.crowd.positions[self.index].tolist(), self.crowd.size)
+
+    @property
+    def sprite(self):
+        return self.crowd.frames[self.crowd.directions[self.index]]
+
+    def draw(self, screen):
+        screen.blit(self.sprite, self.crowd.positions[self.index].tolist())
+
+    def logic(self, **kwargs):
+        # The crowd updates all the ghosts at once.
+        pass
+
+
+class GhostCrowd:
+    SHEET = Ghost.SHEET
+    SCALE = Ghost.SCALE
+    FRAME_SIZE = Ghost.SIZE
+    ACCELERATION = Ghost.ACCELERATION
+    DAMPING = Ghost.DAMPING
+    GOAL_DISTANCE = 60
+    GOAL_ANGLE_STD_DEV = 30  # degrees
+    MAX_GOAL_TRIES = 16
+
+    def __init__(self, nb=16, area=SCREEN):
+        self.area = pygame.Rect(area)
+        self.frames = load_frames(self.SHEET, self.FRAME_SIZE, self.SCALE)
+        self.size = self.frames[0].get_size()
+        self.half_size = np.array(self.size, np.float32) / 2
+
+        self.positions = np.random.uniform(
+            (self.area.left, self.area.top), (self.area.right, self.area.bottom), (nb, 2)
+        ).astype(np.float32)
+        self.velocities = np.zeros((nb, 2), np.float32)
+        self.goals = self.positions + self.half_size
+        self.directions = np.full(nb, 2, np.intp)
+
+        self.ghosts: List[GhostView] = [GhostView(self, i) for i in range(nb)]
+
+    def __len__(self):
+        return len(self.ghosts)
+
+    def __iter__(self):
+        return iter(self.ghosts)
+
+    @property
+    def centers(self):
+        return self.positions + self.half_size
+
+    def invalid_goals(self, centers: np.ndarray) -> np.ndarray:
+        """Ghosts whose goal is in their rect or outside the middle of the area."""
+        middle = self.area.inflate(-30, -30)
+        gx, gy = self.goals[:, 0], self.goals[:, 1]
+        outside = (gx < middle.left) | (gx >= middle.right)
+        outside |= (gy < middle.top) | (gy >= middle.bottom)
+        # The rect of a ghost is centered on its center.
+        reached = np.all(np.abs(self.goals - centers) < self.half_size, axis=1)
+        return outside | reached
+
+    def new_goals(self):
+        """Give a new goal to the ghosts that need one, in the direction they go."""
+        centers = self.centers
+        invalid = self.invalid_goals(centers)
+        for _ in range(self.MAX_GOAL_TRIES):
+            if not invalid.any():
+                return
+            idx = np.flatnonzero(invalid)
+            vx, vy = self.velocities[idx, 0], self.velocities[idx, 1]
+            angles = np.radians(
+                np.random.normal(np.degrees(np.arctan2(vy, vx)), self.GOAL_ANGLE_STD_DEV)
+            )
+            self.goals[idx, 0] = centers[idx, 0] + self.GOAL_DISTANCE * np.cos(angles)
+            self.goals[idx, 1] = centers[idx, 1] + self.GOAL_DISTANCE * np.sin(angles)
+            invalid = self.invalid_goals(centers)
+
+        # The few that are still stuck, for instance in a corner, go to the middle.
+        self.goals[invalid] = self.area.center
+
+    def logic(self):
+        self.new_goals()
+
+        direction = self.goals - self.centers
+        norm = np.hypot(direction[:, 0], direction[:, 1])
+        norm[norm == 0] = 1
+        acceleration = direction * (self.ACCELERATION / norm)[:, None]
+
+        self.velocities *= self.DAMPING
+        self.velocities += acceleration
+        self.positions += self.velocities
+        area = self.area
+        np.clip(self.positions[:, 0], area.left, area.right, out=self.positions[:, 0])
+        np.clip(self.positions[:, 1], area.top, area.bottom, out=self.positions[:, 1])
+
+        self.directions = octants(self.velocities[:, 0], self.velocities[:, 1])
+
+    def draw(self, screen: pygame.Surface, visible: np.ndarray = None, cell_size=CELL_SIZE):
+        """
+        Draw all the ghosts, or only those whose center is visible.
+
+        Args:
+            visible: bool array of the visible cells, indexed [x, y], like FieldOfView.visible.
+            cell_size: size of the cells of visible, in pixels.
+        """
+        positions = self.positions
+        directions = self.directions
+        if visible is not None:
+            cells = (self.centers // cell_size).astype(np.intp)
+            w, h = visible.shape
+            x, y = cells[:, 0], cells[:, 1]
+            inside = (x >= 0) & (x < w) & (y >= 0) & (y < h)
+            shown = np.zeros(len(positions), bool)
+            shown[inside] = visible[cells[inside, 0], cells[inside, 1]]
+            positions = positions[shown]
+            directions = directions[shown]
+
+        frames = self.frames
+        screen.blits(
+            [(frames[d], pos) for d, pos in zip(directions.tolist(), positions.tolist())],
+            doreturn=False,
+        )
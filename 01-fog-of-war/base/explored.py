@@ -0,0 +1,114 @@
+"""
+Memory of the parts of the map that the player has already seen.
+
+The map is stored with one byte per cell of the field of view, 0 for the
+cells that were never seen and 255 for the explored ones. Each update only
+looks at the window of the field of view, so it costs the same whatever the
+size of the map.
+
+The bytes are shared with an 8 bit surface made with pygame.image.frombuffer,
+so the surface is always up to date without ever being redrawn. Its palette maps
+the explored cells to any color, and the unexplored ones to black, or
+to transparent with the colorkey.
+
+Usage:
+    fov = FieldOfView(radius=200)
+    explored = ExploredMap(fov.grid_size)
+    ...
+    # Each frame:
+    if fov.update(player.rect.center):
+        explored.update(fov.visible, fov.window)
+    # Black on the cells never seen, transparent elsewhere.
+    screen.blit(pygame.transform.scale(explored.mask(), SIZE), (0, 0))
+"""
+
+from typing import Tuple
+
+import numpy as np
+import pygame
+
+from .fov import CELL_SIZE
+
+__all__ = ["ExploredMap"]
+
+EXPLORED = 255
+
+
+class ExploredMap:
+    def __init__(self, grid_size: Tuple[int, int], cell_size=CELL_SIZE):
+        """
+        Args:
+            grid_size: size of the map, in cells.
+            cell_size: size of a cell, in pixels.
+        """
+        self.grid_size = grid_size
+        self.cell_size = cell_size
+        # Indexed [y, x], as the rows of the surface.
+        self.cells = np.zeros((grid_size[1], grid_size[0]), np.uint8)
+        self.explored_count = 0
+        self._surface = None
+
+    def update(self, visible: np.ndarray, window=None) -> int:
+        """
+        Mark the visible cells as explored, and return how many were not explored before.
+
+        Args:
+            visible: bool array of the whole map, indexed [x, y] like FieldOfView.visible.
+            window: (x slice, y slice) outside of which nothing is visible, like FieldOfView.window.
+        """
+        if window is None:
+            window = (slice(0, self.grid_size[0]), slice(0, self.grid_size[1]))
+        x, y = window
+
+        cells = self.cells[y, x]
+        new = visible[x, y].T & (cells != EXPLORED)
+        count = int(np.count_nonzero(new))
+        if count:
+            cells[new] = EXPLORED
+            self.explored_count += count
+        return count
+
+    def is_explored(self, pos) -> bool:
+        """Whether the point in pixels was explored."""
+        x, y = int(pos[0] // self.cell_size), int(pos[1] // self.cell_size)
+        w, h = self.grid_size
+        return 0 <= x < w and 0 <= y < h and self.cells[y, x] == EXPLORED
+
+    @property
+    def surface(self) -> pygame.Surface:
+        """An 8 bit surface, one pixel per cell, that shares its pixels with the map."""
+        if self._surface is None:
+            self._surface = pygame.image.frombuffer(self.cells, self.grid_size, "P")
+        return self._surface
+
+    def mask(self, explored_color=(0, 0, 0), unexplored_color=(0, 0, 0), transparent=True):
+        """
+        The map as a surface, one pixel per cell.
+
+        Args:
+            explored_color: color of the explored cells.
+            unexplored_color: color of the cells never seen.
+            transparent: whether the explored cells are transparent.
+        """
+        surface = self.surface
+        palette = [unexplored_color] * 256
+        palette[EXPLORED] = explored_color
+        surface.set_palette(palette)
+        surface.set_colorkey(EXPLORED if transparent else None)
+        return surface
+
+    def save(self, path):
+        """Save the map, with one bit per cell."""
+        np.savez_compressed(
+            path, bits=np.packbits(self.cells == EXPLORED), grid_size=self.grid_size
+        )
+
+    @classmethod
+    def load(cls, path, cell_size=CELL_SIZE) -> "ExploredMap":
+        with np.load(path) as data:
+            grid_size = tuple(int(x) for x in data["grid_size"])
+            explored = cls(grid_size, cell_size)
+            bits = np.unpackbits(data["bits"], count=grid_size[0] * grid_size[1])
+        explored.cells[...] = bits.reshape(explored.cells.shape) * EXPLORED
+        explored.explored_count = int(np.count_nonzero(bits))
+        return explored
@@ -0,0 +1,119 @@
+"""
+Drawing of the fog of war, at the resolution of the field of view.
+
+The fog is composed on a small surface with one pixel per cell of the
+field of view, with a few blits per frame:
+ - each light is a precomputed radial gradient (a stamp), blitted at its position,
+ - the light is multiplied by the cells that are visible,
+ - the cells that were explored before are kept at a dim gray, the others are black.
+The result is scaled to the size of the screen once, and multiplies the screen.
+
+The cost doesn't depend on the number of visible cells, only on the number of lights.
+
+Usage:
+    fov = FieldOfView(radius=200)
+    fog = FogCompositor(fov.grid_size)
+    ...
+    # Each frame, after drawing the objects:
+    if fov.update(player.rect.center):
+        fog.set_visible(fov.visible, fov.window)
+    fog.draw(screen, [(player.rect.center, 200)])
+"""
+
+from functools import lru_cache
+from typing import Iterable, Tuple
+
+import numpy as np
+import pygame
+
+from .explored import ExploredMap
+from .fov import CELL_SIZE
+
+__all__ = ["FogCompositor", "falloff_stamp"]
+
+
+def out_quad(progress):
+    return -progress * (progress - 2)
+
+
+@lru_cache(maxsize=32)
+def falloff_stamp(radius: int) -> pygame.Surface:
+    """
+    A gray disk of the given radius, white at the center and black on the border.
+
+    The stamps are kept for the last radii used, as the lights rarely change size.
+    """
+    offsets = np.arange(-radius, radius + 1, dtype=np.float32)
+    distance = np.hypot(offsets[:, None], offsets[None, :])
+    value = out_quad(np.clip(1 - distance / radius, 0, 1)) * 255
+    gray = np.repeat(value.astype(np.uint8)[:, :, None], 3, axis=2)
+    return pygame.surfarray.make_surface(gray)
+
+
+class FogCompositor:
+    def __init__(self, grid_size: Tuple[int, int], cell_size=CELL_SIZE, explored_value=64):
+        """
+        Args:
+            grid_size: size of the field of view, in cells.
+            cell_size: size of a cell, in pixels.
+            explored_value: brightness of the explored cells that are not visible, out of 255.
+        """
+        self.grid_size = grid_size
+        self.cell_size = cell_size
+        self.explored_value = explored_value
+
+        self.explored = ExploredMap(grid_size, cell_size)
+        self.explored_surface = pygame.Surface(grid_size)
+        self.visible_surface = pygame.Surface(grid_size)
+        self.fog = pygame.Surface(grid_size)
+        self.scaled_fog = None
+
+    def set_visible(self, visible: np.ndarray, window=None):
+        """Update the visible cells, a bool array indexed [x, y].
+        Only needs to be called when they changed.
+
+        Args:
+            window: (x slice, y slice) outside of which nothing is visible, like FieldOfView.window.
+        """
+        if self.explored.update(visible, window):
+            # Blitting the 8 bit map is slower, so it is converted only when it changes.
+            gray = (self.explored_value,) * 3
+            self.explored_surface.blit(self.explored.mask(gray, transparent=False), (0, 0))
+        mask = visible.astype(np.uint8) * 255
+        pygame.surfarray.blit_array(self.visible_surface, np.repeat(mask[:, :, None], 3, axis=2))
+
+    def compose(self, lights: Iterable[Tuple[Tuple[float, float], float]]) -> pygame.Surface:
+        """
+        Compose the fog at the resolution of the grid.
+
+        Args:
+            lights: the center and radius of each light, in pixels.
+        """
+        s = self.cell_size
+        self.fog.fill(0)
+        for (x, y), radius in lights:
+            stamp = falloff_stamp(max(1, round(radius / s)))
+            self.fog.blit(
+                stamp, stamp.get_rect(center=(x // s, y // s)), special_flags=pygame.BLEND_RGB_MAX
+            )
+        self.fog.blit(self.visible_surface, (0, 0), special_flags=pygame.BLEND_RGB_MULT)
+        self.fog.blit(self.explored_surface, (0, 0), special_flags=pygame.BLEND_RGB_MAX)
+        return self.fog
+
+    def draw(self, screen: pygame.Surface, lights, smooth=True):
+        """Darken the screen where it is not visible.
+
+        Args:
+            lights: the center and radius of each light, in pixels.
+            smooth: whether the fog is scaled smoothly, or with visible cells.
+        """
+        fog = self.compose(lights)
+        # The last cells may be partly outside the screen.
+        size = (self.grid_size[0] * self.cell_size, self.grid_size[1] * self.cell_size)
+        if self.scaled_fog is None or self.scaled_fog.get_size() != size:
+            self.scaled_fog = pygame.Surface(size)
+        if smooth:
+            pygame.transform.smoothscale(fog, size, self.scaled_fog)
+        else:
+            pygame.transform.scale(fog, size, self.scaled_fog)
+        screen.blit(self.scaled_fog, (0, 0), special_flags=pygame.BLEND_RGB_MULT)
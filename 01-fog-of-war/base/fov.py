@@ -0,0 +1,207 @@
+"""
+Field of view of the player, computed on a grid with NumPy.
+
+The screen is split in cells of CELL_SIZE pixels, and each cell
+is either free or blocks the light (the SolidObjects). Light rays are
+cast from the cell of the player towards every cell on the border of
+the lit square, and a cell is visible if no cell before it on a ray blocks the light.
+
+The rays only depend on the radius, so they are computed once, and the
+field of view is recomputed only when the player changes cell or an
+obstacle moves. Otherwise, the arrays of the last update are kept.
+
+Usage:
+    fov = FieldOfView(radius=200)
+    fov.set_occluders(trees)
+    ...
+    # Each frame:
+    fov.update(player.rect.center)
+    fov.visible   # bool array of shape fov.grid_size
+    fov.distance  # float32 array, distance in pixels to the player, inf if not visible
+    fov.window    # slices of the part of the grid that can be visible
+
+Both arrays are indexed [x, y], like pygame.surfarray,
+so they can be turned into surfaces with pygame.surfarray.make_surface.
+"""
+
+from functools import lru_cache
+from typing import Iterable, Tuple
+
+import numpy as np
+import pygame
+
+from wclib.constants import SIZE
+
+__all__ = ["FieldOfView", "OcclusionGrid"]
+
+CELL_SIZE = 4
+
+
+class OcclusionGrid:
+    """
+    Which cells block the light, stored as one bit per cell.
+
+    The grid is surrounded by a border of [padding] cells that always block the light,
+    so that rays never need to be clipped to the grid.
+    """
+
+    def __init__(self, grid_size: Tuple[int, int], padding=0, cell_size=CELL_SIZE):
+        self.grid_size = grid_size
+        self.padding = padding
+        self.cell_size = cell_size
+        self.padded_size = (grid_size[0] + 2 * padding, grid_size[1] + 2 * padding)
+        # The padded grid, flattened in [x, y] order: cell i is bit 7 - i % 8 of bits[i // 8].
+        self.bits = np.zeros(0, np.uint8)
+        self._rects = None
+        self.set_rects(())
+
+    def cells_of(self, rect: pygame.Rect) -> Tuple[slice, slice]:
+        """The cells covered by a rect in the padded grid, as slices."""
+        s = self.cell_size
+        p = self.padding
+        return (
+            slice(p + max(0, rect.left // s), p + min(self.grid_size[0], -(-rect.right // s))),
+            slice(p + max(0, rect.top // s), p + min(self.grid_size[1], -(-rect.bottom // s))),
+        )
+
+    def set_rects(self, rects: Iterable[pygame.Rect]) -> bool:
+        """Make the cells under the rects block the light.
+        Return whether anything changed since the last call."""
+        rects = sorted(tuple(r) for r in rects)
+        if rects == self._rects:
+            return False
+        self._rects = rects
+
+        p = self.padding
+        grid = np.ones(self.padded_size, bool)
+        grid[p : p + self.grid_size[0], p : p + self.grid_size[1]] = False
+        for rect in rects:
+            grid[self.cells_of(pygame.Rect(rect))] = True
+        self.bits = np.packbits(grid)
+        return True
+
+    def blocked(self, indices: np.ndarray) -> np.ndarray:
+        """Whether the cells at the given flat indices in the padded grid block the light."""
+        return (self.bits[indices >> 3] >> (7 - (indices & 7)) & 1).astype(bool)
+
+    def to_array(self) -> np.ndarray:
+        """The unpacked grid without padding, as a bool array indexed [x, y]."""
+        grid = np.unpackbits(self.bits, count=self.padded_size[0] * self.padded_size[1])
+        p = self.padding
+        grid = grid.reshape(self.padded_size)[p : p + self.grid_size[0], p : p + self.grid_size[1]]
+        return grid.astype(bool)
+
+
+@lru_cache()
+def rays(radius: int, height: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Cells on the rays from (0, 0) to each cell of the border
+    of the square of side 2 * radius + 1, in a grid of the given height.
+
+    Returns:
+        offsets: flat index of each cell, relative to the center. Shape (nb_rays, radius).
+        inside: whether the cell is in the circle of the radius.
+        distances: distance of the cell to the center, in cells.
+    """
+    r = radius
+    border = (
+        [(x, -r) for x in range(-r, r)]
+        + [(r, y) for y in range(-r, r)]
+        + [(x, r) for x in range(r, -r, -1)]
+        + [(-r, y) for y in range(r, -r, -1)]
+    )
+    ends = np.array(border, np.float32)
+    steps = np.arange(1, r + 1, dtype=np.float32) / r
+    dx = np.rint(ends[:, 0, None] * steps).astype(np.intp)
+    dy = np.rint(ends[:, 1, None] * steps).astype(np.intp)
+    distances = np.hypot(dx, dy).astype(np.float32)
+    return dx * height + dy, distances <= r, distances
+
+
+class FieldOfView:
+    def __init__(self, radius=200, size=SIZE, cell_size=CELL_SIZE):
+        """
+        Args:
+            radius: how far the player sees, in pixels.
+            size: size of the world in pixels.
+            cell_size: size of the cells in pixels. Smaller is finer but slower.
+        """
+        self.cell_size = cell_size
+        self.radius = max(1, round(radius / cell_size))  # in cells
+        self.grid_size = (-(-size[0] // cell_size), -(-size[1] // cell_size))
+        self.occlusion = OcclusionGrid(self.grid_size, self.radius, cell_size)
+
+        # The results are computed in the padded grid, and visible/distance
+        # are views of the part without padding.
+        self._visible = np.zeros(self.occlusion.padded_size, bool)
+        self._distance = np.full(self.occlusion.padded_size, np.inf, np.float32)
+        r = self.radius
+        self.visible = self._visible[r:-r, r:-r]
+        self.distance = self._distance[r:-r, r:-r]
+
+        self.cell = None  # Cell of the player at the last update.
+        self.dirty = True
+        # The part of the grid that can be lit, as slices. Everything else is never visible.
+        self.window = (slice(0, 0), slice(0, 0))
+        self._lit_square = None
+
+    def set_occluders(self, objects):
+        """Make the objects block the light. This can be called every frame,
+        the field of view is recomputed only if they moved."""
+        if self.occlusion.set_rects(obj.rect for obj in objects):
+            self.dirty = True
+
+    def cell_of(self, pos) -> Tuple[int, int]:
+        return int(pos[0] // self.cell_size), int(pos[1] // self.cell_size)
+
+    def update(self, pos) -> bool:
+        """Update the field of view for a player at the given position, in pixels.
+        Return whether it was recomputed."""
+        cell = self.cell_of(pos)
+        if not self.dirty and cell == self.cell:
+            return False
+
+        self.cell = cell
+        self.dirty = False
+        self.compute(*cell)
+        return True
+
+    def compute(self, cx: int, cy: int):
+        r = self.radius
+        w, h = self.grid_size
+        # Only the square around the last cell can be lit, so only it
+        # needs to be cleared, whatever the size of the world.
+        if self._lit_square is not None:
+            self._visible[self._lit_square] = False
+            self._distance[self._lit_square] = np.inf
+        self._lit_square = None
+        if not (0 <= cx < w and 0 <= cy < h):
+            self.window = (slice(0, 0), slice(0, 0))
+            return
+        self.window = (
+            slice(max(0, cx - r), min(w, cx + r + 1)),
+            slice(max(0, cy - r), min(h, cy + r + 1)),
+        )
+        # In the padded grid, the square is never clipped.
+        self._lit_square = (slice(cx, cx + 2 * r + 1), slice(cy, cy + 2 * r + 1))
+
+        height = self.occlusion.padded_size[1]
+        offsets, in_circle, distances = rays(r, height)
+        indices = offsets + ((cx + r) * height + cy + r)
+
+        # The light stops after the first blocked cell of each ray, which is still lit.
+        blocked = self.occlusion.blocked(indices[:, :-1])
+        lit = in_circle.copy()
+        lit[:, 1:] &= ~np.logical_or.accumulate(blocked, axis=1)
+
+        indices = indices[lit]
+        self._visible.ravel()[indices] = True
+        self._visible[cx + r, cy + r] = True
+        self._distance.ravel()[indices] = distances[lit] * self.cell_size
+        self._distance[cx + r, cy + r] = 0
+
+    def is_visible(self, pos) -> bool:
+        """Whether a point in pixels is in the field of view."""
+        x, y = self.cell_of(pos)
+        w, h = self.grid_size
+        return 0 <= x < w and 0 <= y < h and bool(self.visible[x, y])
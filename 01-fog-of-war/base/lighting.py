@@ -0,0 +1,149 @@
+"""
+Soft colored lights, blurred on a small grid.
+
+Each light adds its color to one cell of a small grid (LIGHTING_GRID_DIMS),
+which is then blurred with a gaussian, to spread the light around its source,
+and smoothly scaled to the size of the screen.
+
+The gaussian blur is separable: blurring the columns then the rows
+is the same as a 2D blur. Each of them is a multiplication by a precomputed
+band matrix, so the whole blur is two matrix products done by NumPy.
+All the arrays are allocated once, and reused each frame.
+
+Usage:
+    light_map = LightMap()
+    ...
+    # Each frame, after drawing the objects:
+    light_map.compute([(player.rect.center, (1, 0.9, 0.7)), (ghost.rect.center, (1, 0.4, 0.8))])
+    light_map.draw(screen)
+"""
+
+from functools import lru_cache
+from typing import Iterable, Tuple
+
+import numpy as np
+import pygame
+
+from wclib.constants import SIZE
+
+__all__ = ["LightMap", "SeparableBlur", "gaussian_kernel"]
+
+LIGHTING_GRID_DIMS = 64, 48
+# Weights of each channel in the perceived brightness.
+LUMINANCE = np.array([0.2126, 0.7152, 0.0722], np.float32)
+
+
+def gaussian_kernel(radius: int, std_dev=None) -> np.ndarray:
+    """
+    Normalized gaussian of 2 * radius + 1 points.
+    The standard deviation is radius / 2 by default.
+    """
+    std_dev = std_dev or radius / 2
+    x = np.arange(-radius, radius + 1, dtype=np.float32)
+    kernel = np.exp(-0.5 * (x / std_dev) ** 2)
+    return kernel / kernel.sum()
+
+
+@lru_cache()
+def blur_matrix(size: int, radius: int, std_dev=None) -> np.ndarray:
+    """
+    Matrix M such that M @ v is the blur of the vector v, with zeros outside of v.
+
+    M[i, j] is the weight of v[j] in the blurred value at i.
+    It is symmetric, as the gaussian is.
+    """
+    kernel = gaussian_kernel(radius, std_dev)
+    matrix = np.zeros((size, size), np.float32)
+    for offset, weight in zip(range(-radius, radius + 1), kernel):
+        np.fill_diagonal(matrix[max(0, -offset) :, max(0, offset) :], weight)
+    return matrix
+
+
+class SeparableBlur:
+    """Gaussian blur of arrays of a fixed shape, (w, h) or (w, h, channels)."""
+
+    def __init__(self, shape: Tuple[int, ...], radius: int, std_dev=None):
+        self.shape = shape
+        self.x_matrix = blur_matrix(shape[0], radius, std_dev)
+        self.y_matrix = blur_matrix(shape[1], radius, std_dev)
+        self.buffer = np.empty(shape, np.float32)
+
+    def __call__(self, array: np.ndarray, out: np.ndarray = None) -> np.ndarray:
+        """Blur a float32 array into out, which must not be the same array."""
+        if out is None:
+            out = np.empty(self.shape, np.float32)
+        w = self.shape[0]
+
+        # Along x, all the other axes at once.
+        np.matmul(self.x_matrix, array.reshape(w, -1), out=self.buffer.reshape(w, -1))
+        # Along y.
+        if len(self.shape) == 2:
+            np.matmul(self.buffer, self.y_matrix, out=out)
+        else:
+            # One (h, channels) matrix per column.
+            np.matmul(self.y_matrix, self.buffer, out=out)
+        return out
+
+
+class LightMap:
+    def __init__(self, grid_dims=LIGHTING_GRID_DIMS, size=SIZE, radius=None, std_dev=None):
+        """
+        Args:
+            grid_dims: size of the grid on which the light is computed.
+            size: size of the screen, in pixels.
+            radius: how far the light spreads, in cells.
+                Half the smallest dimension of the grid by default.
+            std_dev: standard deviation of the blur, in cells. Half the radius by default.
+        """
+        self.grid_dims = grid_dims
+        self.size = size
+        radius = radius or min(grid_dims) // 2 - 1
+
+        shape = (*grid_dims, 3)
+        self.blur = SeparableBlur(shape, radius, std_dev)
+        self.sources = np.zeros(shape, np.float32)
+        self.light = np.zeros(shape, np.float32)
+        self.luminance = np.zeros(grid_dims, np.float32)
+        self.pixels = np.zeros(shape, np.uint8)
+
+        # With this gain, the center of a light of color (1, 1, 1) is white.
+        kernel = gaussian_kernel(radius, std_dev)
+        self.gain = 1 / kernel.max() ** 2
+
+        self.surface = pygame.Surface(grid_dims)
+        self.scaled = pygame.Surface(size)
+
+    def cell_of(self, pos) -> Tuple[int, int]:
+        x = int(pos[0] * self.grid_dims[0] / self.size[0])
+        y = int(pos[1] * self.grid_dims[1] / self.size[1])
+        return min(max(x, 0), self.grid_dims[0] - 1), min(max(y, 0), self.grid_dims[1] - 1)
+
+    def compute(self, lights: Iterable[Tuple[Tuple[float, float], Tuple[float, float, float]]]):
+        """
+        Compute the light of all the sources.
+
+        Args:
+            lights: the position of each light in pixels, and its color,
+                with components between 0 and 1.
+        """
+        self.sources.fill(0)
+        for pos, color in lights:
+            self.sources[self.cell_of(pos)] += color
+
+        self.sources *= self.gain
+        self.blur(self.sources, out=self.light)
+        np.clip(self.light, 0, 1, out=self.light)
+        np.matmul(self.light, LUMINANCE, out=self.luminance)
+
+        np.multiply(self.light, 255, out=self.sources)
+        np.copyto(self.pixels, self.sources, casting="unsafe")
+        pygame.surfarray.blit_array(self.surface, self.pixels)
+        pygame.transform.smoothscale(self.surface, self.size, self.scaled)
+
+    def luminance_at(self, pos) -> float:
+        """Brightness of the light at a point in pixels, between 0 and 1."""
+        return float(self.luminance[self.cell_of(pos)])
+
+    def draw(self, screen: pygame.Surface):
+        """Multiply the screen by the light."""
+        screen.blit(self.scaled, (0, 0), special_flags=pygame.BLEND_RGB_MULT)
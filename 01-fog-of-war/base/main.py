@@ -27,22 +27,57 @@ __achievements__ = [  # Uncomment the ones you've done
 ]
 
 
-from operator import attrgetter
 import pygame
 
 # To import the modules in yourname/, you need to use relative imports,
 # otherwise your project will not be compatible with the showcase.
 from .objects import Ghost, Player, SolidObject
+from .render_order import RenderOrder
 
 BACKGROUND = 0x66856C
 
 
+def numpy_fog(trees):
+    """The field of view of fov.py and the fog of fog.py, with the trees blocking the view."""
+    from .fog import FogCompositor
+    from .fov import FieldOfView
+
+    fov = FieldOfView(radius=200)
+    fov.set_occluders(trees)
+    return fov, FogCompositor(fov.grid_size)
+
+
+def numpy_light_map():
+    """The light map of lighting.py."""
+    from .lighting import LightMap
+
+    return LightMap()
+
+
+def numpy_crowd(ghosts):
+    """A GhostCrowd of crowd.py, with as many ghosts, that updates them all at once."""
+    from .crowd import GhostCrowd
+
+    crowd = GhostCrowd(len(ghosts))
+    # The ghosts stay where they are.
+    crowd.positions[:] = [tuple(ghost.pos) for ghost in ghosts]
+    crowd.goals = crowd.centers
+    return crowd
+
+
 def mainloop():
     player = Player((100, 100))
     trees = SolidObject.generate_many(36)
     ghosts = [Ghost() for _ in range(16)]
 
     all_objects = trees + [player] + ghosts
+    # The trees never move, they are sorted only once.
+    render_order = RenderOrder(trees, [player] + ghosts)
+    # The fog, the lights and the crowd of ghosts made with the numpy
+    # helpers of this folder, toggled with F, L and G.
+    fog = None
+    light_map = None
+    crowd = None
 
     clock = pygame.time.Clock()
     while True:
@@ -50,14 +85,44 @@ def mainloop():
         for event in events:
             if event.type == pygame.QUIT:
                 return
+            elif event.type == pygame.KEYDOWN and event.key == pygame.K_f:
+                fog = None if fog else numpy_fog(trees)
+            elif event.type == pygame.KEYDOWN and event.key == pygame.K_l:
+                light_map = None if light_map else numpy_light_map()
+            elif event.type == pygame.KEYDOWN and event.key == pygame.K_g:
+                for ghost in ghosts:
+                    render_order.remove_moving(ghost)
+                if crowd is not None:
+                    ghosts = [Ghost(view.pos) for view in crowd]
+                    crowd = None
+                else:
+                    crowd = numpy_crowd(ghosts)
+                    ghosts = list(crowd)
+                for ghost in ghosts:
+                    render_order.add_moving(ghost)
+                all_objects = trees + [player] + ghosts
 
         for obj in all_objects:
             obj.logic(objects=all_objects)
+        if crowd is not None:
+            # The GhostViews don't update themselves.
+            crowd.logic()
 
         screen.fill(BACKGROUND)
-        for object in sorted(all_objects, key=attrgetter("rect.bottom")):
+        for object in render_order:
             object.draw(screen)
 
+        if light_map:
+            lights = [(player.rect.center, (1, 0.9, 0.7))]
+            lights += [(ghost.rect.center, (0.5, 0.2, 0.4)) for ghost in ghosts]
+            light_map.compute(lights)
+            light_map.draw(screen)
+        if fog:
+            fov, compositor = fog
+            if fov.update(player.rect.center):
+                compositor.set_visible(fov.visible, fov.window)
+            compositor.draw(screen, [(player.rect.center, 200)])
+
         clock.tick(60)
 
 
@@ -32,5 +32,5 @@ class Metadata:
     # on install and import are also not supported. If you need it,
     # please open an issue on the GitHub.
     dependencies = [
-        # "numpy",
+        # "numpy",  # Only if you use fov.py, fog.py, explored.py, lighting.py or crowd.py.
     ]
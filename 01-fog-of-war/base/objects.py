@@ -10,9 +10,28 @@ from random import choice, gauss
 import pygame
 
 from wclib import SIZE
-from .utils import clamp, from_polar, load_image, random_in_rect
+from .spatial_index import SpatialIndex
+from .utils import clamp, from_polar, load_frames, load_image, random_in_rect
 
 SCREEN = pygame.Rect(0, 0, *SIZE)
+TAN_22_5 = 0.41421356  # tan(22.5°), half of an octant.
+
+
+def octant(x, y):
+    """
+    Index of the frame of an 8 directional sprite for a direction,
+    starting with 0 for down and turning counter-clockwise on the screen.
+    """
+    ax = abs(x)
+    ay = abs(y)
+    if ay <= ax * TAN_22_5:
+        return 2 if x >= 0 else 6
+    elif ax <= ay * TAN_22_5:
+        return 0 if y > 0 else 4
+    elif y > 0:
+        return 1 if x > 0 else 7
+    else:
+        return 3 if x > 0 else 5
 
 
 class Object:
@@ -22,13 +41,21 @@ class Object:
         self.pos = pygame.Vector2(pos)
         self.size = pygame.Vector2(sprite.get_size())
         self.sprite = sprite
+        # The rect is only rebuilt when the position changes.
+        self._rect = None
+        self._rect_pos = pygame.Vector2()
 
     def __str__(self):
         return f"<{self.__class__.__name__}(pos={self.pos}, size={self.size})>"
 
     @property
     def rect(self):
-        return pygame.Rect(self.pos, self.size)
+        # The rect is kept until the object moves, and a copy is returned,
+        # which is faster than building it from the vectors each time.
+        if self._rect is None or self.pos != self._rect_pos:
+            self._rect = pygame.Rect(self.pos, self.size)
+            self._rect_pos.update(self.pos)
+        return self._rect.copy()
 
     def draw(self, screen):
         screen.blit(self.sprite, self.pos)
@@ -53,21 +80,22 @@ class Object8Directional(Object):
     def __init__(self, pos):
         self.velocity = pygame.Vector2()
         self.acceleration = pygame.Vector2()
+        self.direction = octant(0, 0)
 
         super().__init__(pos, self.get_image())
 
     def get_image(self):
-        angle = self.velocity.as_polar()[1]
-        idx = int((-angle + 90 + 45 / 2) % 360 / 360 * 8)
-        sheet = load_image(self.SHEET, self.SCALE)
-        unit = self.SIZE * self.SCALE
-        return sheet.subsurface(idx * unit, 0, unit, unit)
+        return load_frames(self.SHEET, self.SIZE, self.SCALE)[self.direction]
 
     def logic(self, **kwargs):
         self.velocity *= self.DAMPING
         self.velocity += self.acceleration
         self.pos += self.velocity
-        self.sprite = self.get_image()
+
+        direction = octant(*self.velocity)
+        if direction != self.direction:
+            self.direction = direction
+            self.sprite = self.get_image()
 
         self.pos.x = clamp(self.pos.x, 0, SIZE[0])
         self.pos.y = clamp(self.pos.y, 0, SIZE[1])
@@ -126,12 +154,25 @@ class SolidObject(Object):
         super().__init__(pos, sheet.subsurface(rect))
 
     @classmethod
-    def generate_many(cls, nb=16, max_tries=1000):
+    def generate_many(cls, nb=16, max_tries=1000, area=SCREEN, index: SpatialIndex = None):
+        """
+        Place nb objects at random in the area, without overlap.
+
+        Args:
+            max_tries: how many positions can be rejected before giving up.
+            index: if given, the objects are added to it,
+                and don't overlap the objects already in it.
+        """
+        if index is None:
+            index = SpatialIndex()
         objects = []
         tries = 0  # avoids infinite loop
         while len(objects) < nb and tries < max_tries:
-            pos = random_in_rect(SCREEN)
+            pos = random_in_rect(area)
             obj = cls(pos)
-            if not any(obj.rect.colliderect(other.rect) for other in objects):
+            if index.collides(obj.rect):
+                tries += 1
+            else:
+                index.add(obj)
                 objects.append(obj)
         return objects
@@ -0,0 +1,65 @@
+"""
+Order in which the objects are drawn, from the back to the front.
+
+Objects lower on the screen are drawn on top of the others. Sorting all the
+objects every frame is wasteful, as most of them never move: the static
+objects are sorted once, and only the few moving ones are sorted each frame,
+then merged in with a binary search.
+"""
+
+from bisect import bisect_right
+from typing import Iterable, Iterator, List
+
+from .objects import Object
+
+__all__ = ["RenderOrder"]
+
+
+def depth(obj: Object):
+    return obj.rect.bottom
+
+
+class RenderOrder:
+    def __init__(self, static: Iterable[Object] = (), moving: Iterable[Object] = ()):
+        """
+        Args:
+            static: objects that never move, like the SolidObjects.
+            moving: objects that may move at each frame, like the Player and the Ghosts.
+        """
+        self.static: List[Object] = sorted(static, key=depth)
+        self.static_depths = [depth(obj) for obj in self.static]
+        self.moving: List[Object] = list(moving)
+
+    def __len__(self):
+        return len(self.static) + len(self.moving)
+
+    def add_static(self, obj: Object):
+        d = depth(obj)
+        i = bisect_right(self.static_depths, d)
+        self.static_depths.insert(i, d)
+        self.static.insert(i, obj)
+
+    def remove_static(self, obj: Object):
+        i = self.static.index(obj)
+        del self.static[i]
+        del self.static_depths[i]
+
+    def add_moving(self, obj: Object):
+        self.moving.append(obj)
+
+    def remove_moving(self, obj: Object):
+        self.moving.remove(obj)
+
+    def __iter__(self) -> Iterator[Object]:
+        """The objects, from the back to the front."""
+        # The moving objects barely move between two frames, so they are almost
+        # sorted already, and sorting them again is linear.
+        self.moving.sort(key=depth)
+
+        start = 0
+        for obj in self.moving:
+            end = bisect_right(self.static_depths, depth(obj), start)
+            yield from self.static[start:end]
+            yield obj
+            start = end
+        yield from self.static[start:]
@@ -0,0 +1,98 @@
+"""
+Grid of buckets to find quickly the objects in a region of the world.
+
+The world is split in square cells, and each object is stored in the
+buckets of all the cells that its rect touches. Finding the objects in a rect
+only needs to look at the few buckets under it, whatever the number of objects.
+
+It is meant for objects that don't move, like the SolidObjects: if an object
+moves, it has to be removed and added again.
+
+Usage:
+    index = SpatialIndex()
+    trees = SolidObject.generate_many(10_000, area=world, index=index)
+    ...
+    # Only the trees that can cast a shadow in the light of the player.
+    fov.set_occluders(index.near(player.rect.center, light_radius))
+"""
+
+from collections import defaultdict
+from typing import TYPE_CHECKING, Dict, Iterator, List, Set, Tuple
+
+import pygame
+
+if TYPE_CHECKING:
+    # objects.py imports this module.
+    from .objects import Object
+
+__all__ = ["SpatialIndex"]
+
+
+class SpatialIndex:
+    def __init__(self, cell_size=128):
+        self.cell_size = cell_size
+        self.buckets: Dict[Tuple[int, int], List["Object"]] = defaultdict(list)
+        self.objects: Set["Object"] = set()
+
+    def __len__(self):
+        return len(self.objects)
+
+    def __iter__(self):
+        return iter(self.objects)
+
+    def __contains__(self, obj):
+        return obj in self.objects
+
+    def cells(self, rect: pygame.Rect) -> Iterator[Tuple[int, int]]:
+        """The cells that a rect touches."""
+        s = self.cell_size
+        for x in range(rect.left // s, (rect.right - 1) // s + 1):
+            for y in range(rect.top // s, (rect.bottom - 1) // s + 1):
+                yield x, y
+
+    def add(self, obj: "Object"):
+        self.objects.add(obj)
+        for cell in self.cells(obj.rect):
+            self.buckets[cell].append(obj)
+
+    def remove(self, obj: "Object"):
+        self.objects.remove(obj)
+        for cell in self.cells(obj.rect):
+            bucket = self.buckets[cell]
+            bucket.remove(obj)
+            if not bucket:
+                del self.buckets[cell]
+
+    def query(self, rect) -> Set["Object"]:
+        """All the objects that collide with the rect."""
+        rect = pygame.Rect(rect)
+        found = set()
+        for cell in self.cells(rect):
+            for obj in self.buckets.get(cell, ()):
+                if obj not in found and obj.rect.colliderect(rect):
+                    found.add(obj)
+        return found
+
+    def collides(self, rect) -> bool:
+        """Whether any object collides with the rect. Faster than query()."""
+        rect = pygame.Rect(rect)
+        for cell in self.cells(rect):
+            for obj in self.buckets.get(cell, ()):
+                if obj.rect.colliderect(rect):
+                    return True
+        return False
+
+    def near(self, pos, radius) -> Set["Object"]:
+        """All the objects whose rect is at most radius pixels away from pos."""
+        x, y = pos
+        radius_squared = radius ** 2
+        # One pixel more on each side, for the rects that just touch the circle.
+        area = pygame.Rect(x - radius - 1, y - radius - 1, 2 * radius + 2, 2 * radius + 2)
+        found = set()
+        for obj in self.query(area):
+            r = obj.rect
+            dx = max(r.left - x, 0, x - r.right)
+            dy = max(r.top - y, 0, y - r.bottom)
+            if dx * dx + dy * dy <= radius_squared:
+                found.add(obj)
+        return found
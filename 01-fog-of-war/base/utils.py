@@ -17,6 +17,16 @@ def load_image(name: str, scale=1):
     return image.convert_alpha()
 
 
+@lru_cache()
+def load_frames(name: str, frame_size: int, scale=1):
+    """Split a horizontal sprite sheet of square frames, once."""
+    sheet = load_image(name, scale)
+    unit = frame_size * scale
+    return tuple(
+        sheet.subsurface(i * unit, 0, unit, unit) for i in range(sheet.get_width() // unit)
+    )
+
+
 def clamp(value, mini, maxi):
     """Clamp value between mini and maxi"""
     if value < mini:
@@ -9,22 +9,89 @@ Feel free to modify everything in this file to your liking.
 """
 
 import time
+from bisect import insort
 from collections import deque
 from colorsys import hsv_to_rgb
 from functools import lru_cache
-from operator import attrgetter
 from random import gauss, choices, uniform
+from typing import Dict, Iterator, List
 
 import pygame
 
+# noinspection PyPackages
+from .rotation_atlas import ROTATIONS
+# noinspection PyPackages
+from .spatial_hash import SpatialHash
 # noinspection PyPackages
 from .utils import *
 
 
+# The regions outside of each side of the screen, with where to draw
+# again the objects that overlap them, on the other side.
+OUTSIDE = [
+    (pygame.Rect(-SIZE[0], -SIZE[1], SIZE[0], 3 * SIZE[1]), SIZE[0]),  # left
+    (pygame.Rect(SIZE[0], -SIZE[1], SIZE[0], 3 * SIZE[1]), -SIZE[0]),  # right
+    (pygame.Rect(-SIZE[0], -SIZE[1], 3 * SIZE[0], SIZE[1]), SIZE[1]),  # top
+    (pygame.Rect(-SIZE[0], SIZE[1], 3 * SIZE[0], SIZE[1]), -SIZE[1]),  # bottom
+]
+
+
+def wrap_offsets(rect: pygame.Rect):
+    """Where to draw an object so that it wraps around the screen, relative to its rect."""
+    w, h = SIZE
+    dxs = [0]
+    dys = [0]
+    if rect.left < 0:
+        dxs.append(w)
+    elif rect.right > w:
+        dxs.append(-w)
+    if rect.top < 0:
+        dys.append(h)
+    elif rect.bottom > h:
+        dys.append(-h)
+    return [(dx, dy) for dx in dxs for dy in dys]
+
+
+class RenderQueue:
+    """
+    The objects to draw, in one layer for each Z, from the lowest Z to the highest.
+
+    Adding and removing an object is O(1), and nothing needs to be sorted to draw.
+    The Z of an object must not change while it is in the queue.
+    """
+
+    def __init__(self):
+        # Dicts keep the order of insertion, so objects of
+        # the same Z are always drawn in the same order.
+        self.layers: Dict[int, Dict["Object", None]] = {}
+        self.order: List[int] = []
+
+    def __len__(self):
+        return sum(len(layer) for layer in self.layers.values())
+
+    def __iter__(self) -> Iterator["Object"]:
+        for z in self.order:
+            yield from self.layers[z]
+
+    def add(self, obj: "Object"):
+        layer = self.layers.get(obj.Z)
+        if layer is None:
+            layer = self.layers[obj.Z] = {}
+            insort(self.order, obj.Z)
+        layer[obj] = None
+
+    def remove(self, obj: "Object"):
+        del self.layers[obj.Z][obj]
+
+
 class State:
     def __init__(self, *initial_objects: "Object"):
         self.objects = set()
         self.objects_to_add = set()
+        # To find quickly the objects close to a position, for collisions.
+        self.spatial_hash = SpatialHash()
+        # The objects sorted by Z, for drawing.
+        self.render_queue = RenderQueue()
 
         for obj in initial_objects:
             self.add(obj)
@@ -44,11 +111,61 @@ class State:
                 to_remove.add(obj)
         self.objects.difference_update(to_remove)
         self.objects.update(self.objects_to_add)
+        for obj in to_remove:
+            self.spatial_hash.remove(obj)
+            self.render_queue.remove(obj)
+        for obj in self.objects_to_add:
+            self.spatial_hash.add(obj)
+            self.render_queue.add(obj)
         self.objects_to_add.clear()
 
     def draw(self, screen):
-        for obj in sorted(self.objects, key=attrgetter("Z")):
-            obj.draw(screen)
+        batch = []
+        for obj in self.render_queue:
+            if type(obj).draw is Object.draw:
+                batch.append(obj)
+            else:
+                # Objects with their own draw are drawn in between, to keep the order of Z.
+                self.draw_batch(screen, batch)
+                batch.clear()
+                obj.draw(screen)
+        self.draw_batch(screen, batch)
+
+    @staticmethod
+    def draw_batch(screen, objects):
+        """Draw objects with the default Object.draw, with a single blits call."""
+        if not objects:
+            return
+
+        rects = [obj.rect for obj in objects]
+
+        # Goal: wrap around the screen. Instead of testing each object,
+        # each side finds all the rects that overlap it in a single call.
+        x_shifts = {}
+        y_shifts = {}
+        for shifts, (region, shift) in zip((x_shifts, x_shifts, y_shifts, y_shifts), OUTSIDE):
+            for i in region.collidelistall(rects):
+                shifts[i] = shift
+
+        blits = []
+        for i, (obj, rect) in enumerate(zip(objects, rects)):
+            sprite = obj.rotated_sprite
+            blits.append((sprite, rect))
+            if i in x_shifts or i in y_shifts:
+                # The copies come right after the object, so that they keep its Z.
+                dx = x_shifts.get(i, 0)
+                dy = y_shifts.get(i, 0)
+                # The other side, and the opposite corner if it is near two sides.
+                for offset in dict.fromkeys([(dx, 0), (0, dy), (dx, dy)]):
+                    if offset != (0, 0):
+                        blits.append((sprite, rect.move(offset)))
+
+        screen.blits(blits, doreturn=False)
+
+        # To see the exact size of the hitboxes
+        if pygame.key.get_pressed()[pygame.K_d]:
+            for obj in objects:
+                pygame.draw.circle(screen, "red", obj.center, obj.radius, width=1)
 
     def handle_event(self, event):
         for obj in self.objects:
@@ -103,15 +220,14 @@ class Object:
 
     @property
     def rotated_sprite(self):
-        # We round the rotation to the nearest integer so that
-        # the cache has a chance to work. Otherwise there would
-        # always be cache misses: it is very unlikely to have
-        # to floats that are equal.
-        return rotate_image(self.sprite, int(self.rotation))
+        # The rotations are rounded to a few angles, and each of them
+        # is rendered only once, then found in the atlas.
+        return ROTATIONS.get(self.sprite, self.rotation)[0]
 
     def get_rect(self):
         """Compute the rectangle containing the object."""
-        return self.rotated_sprite.get_rect(center=self.center)
+        frame, (dx, dy) = ROTATIONS.get(self.sprite, self.rotation)
+        return pygame.Rect(round(self.center.x) + dx, round(self.center.y) + dy, *frame.get_size())
 
     def handle_event(self, event):
         """Override this method to make an object react to events.
@@ -119,41 +235,12 @@ class Object:
         return False
 
     def draw(self, screen):
-        screen.blit(self.rotated_sprite, self.rect)
-
-        # Goal: wrap around the screen.
-        w, h = SIZE
-        tl = 0, 0
-        tr = w, 0
-        br = w, h
-        bl = 0, h
-
-        shifts = []
-        for a, b, offset in [
-            (tl, tr, (0, h)),
-            (bl, br, (0, -h)),
-            (tl, bl, (w, 0)),
-            (tr, br, (-w, 0)),
-        ]:
-            # For each side [a,b] of the screen that it overlaps
-            if self.rect.clipline(a, b):
-                shifts.append(offset)
-                # Draw the spaceship at the other edge too.
-                screen.blit(
-                    self.rotated_sprite,
-                    self.rotated_sprite.get_rect(center=self.center + offset),
-                )
-
-        # Take care of the corners of the screen.
-        # Here I assume that no object can touch two sides of the screen
-        # at the same time. If so, the code wouldn't be correct, but still
-        # produce the expected result -.-'
-        assert len(shifts) <= 2
-        if len(shifts) == 2:
-            screen.blit(
-                self.rotated_sprite,
-                self.rotated_sprite.get_rect(center=self.center + shifts[0] + shifts[1]),
-            )
+        # Goal: wrap around the screen, by drawing the object at the other edges too.
+        sprite = self.rotated_sprite
+        screen.blits(
+            [(sprite, self.rect.move(offset)) for offset in wrap_offsets(self.rect)],
+            doreturn=False,
+        )
 
         # To see the exact size of the hitboxes
         if pygame.key.get_pressed()[pygame.K_d]:
@@ -167,6 +254,8 @@ class Object:
         self.center.y %= SIZE[1]
 
         self.rect = self.get_rect()
+        if self.state is not None:
+            self.state.spatial_hash.move(self)
 
 
 class Player(Object):
@@ -275,18 +364,13 @@ class Asteroid(Object):
     def logic(self):
         super().logic()
 
-        for obj in self.state.objects:
-            if not obj.alive:
-                continue
-
-            if isinstance(obj, Bullet):
-                # Detect if the bullet and asteroid collide.
-                if self.collide(obj):
-                    self.explode(obj)
-                    break
-            elif isinstance(obj, Player):
-                if self.collide(obj):
-                    obj.on_asteroid_collision(self)
+        # Only the bullets and players close to the asteroid are checked.
+        spatial_hash = self.state.spatial_hash
+        for bullet in spatial_hash.colliding(self, Bullet):
+            self.explode(bullet)
+            return
+        for player in spatial_hash.colliding(self, Player):
+            player.on_asteroid_collision(self)
 
     def explode(self, bullet):
         bullet.alive = False
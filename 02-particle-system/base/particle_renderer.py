@@ -0,0 +1,145 @@
+"""
+Draw thousands of particles with a single blits call.
+
+Each particle is drawn with a small pre-rendered sprite, one for each shape,
+radius and color. Colors are rounded to a few steps per channel, so that
+the particles share a limited number of sprites, which are kept in an
+LRU cache. Each renderer also keeps the sprites it used in an array, so that
+the sprites of all the particles are found with one NumPy lookup, and they
+are all sent to Surface.blits (or Surface.fblits if available) at once.
+The array is cleared each time the LRU cache forgets sprites, so that it
+doesn't keep them alive.
+
+Usage:
+    renderer = ParticleRenderer(additive=True)
+    particles = state.add(ParticlePool(renderer=renderer))
+"""
+
+from functools import lru_cache
+from itertools import repeat
+from typing import Tuple
+
+import numpy as np
+import pygame
+
+__all__ = ["ParticleRenderer", "particle_sprite"]
+
+SHAPES = ("circle", "square")
+
+
+MAX_SPRITES = 4096
+
+
+def evictions() -> int:
+    """How many sprites the cache of particle_sprite has forgotten."""
+    info = particle_sprite.cache_info()
+    return info.misses - info.currsize
+
+
+@lru_cache(maxsize=MAX_SPRITES)
+def particle_sprite(shape: str, radius: int, color: Tuple[int, int, int]) -> pygame.Surface:
+    """A sprite of the given shape, with black as the transparent color."""
+    size = 2 * radius + 1
+    sprite = pygame.Surface((size, size))
+    if shape == "circle":
+        pygame.draw.circle(sprite, color, (radius, radius), radius + 0.5)
+    elif shape == "square":
+        sprite.fill(color)
+    else:
+        raise ValueError(f"Unknown shape {shape!r}, expected one of {SHAPES}.")
+    sprite.set_colorkey((0, 0, 0))
+    return sprite
+
+
+class ParticleRenderer:
+    def __init__(self, shape="circle", color_steps=16, additive=False):
+        """
+        Args:
+            shape: "circle" or "square".
+            color_steps: number of different values for each channel of the colors.
+                Fewer steps means fewer sprites, but visible color bands.
+            additive: whether the colors of the particles are added to the screen,
+                which is nice for light, fire and sparks.
+        """
+        if shape not in SHAPES:
+            raise ValueError(f"Unknown shape {shape!r}, expected one of {SHAPES}.")
+        self.shape = shape
+        self.color_steps = color_steps
+        self.special_flags = pygame.BLEND_RGB_ADD if additive else 0
+        # The sprite for each key computed in sprites(), once it has been needed.
+        self.table = np.empty(0, object)
+        self.known = np.zeros(0, bool)
+        # The value of evictions() when the table was last checked.
+        self.evictions = evictions()
+
+    def sprites(self, radii: np.ndarray, colors: np.ndarray) -> np.ndarray:
+        """The sprite of each particle, as an array of surfaces."""
+        step = 256 // self.color_steps
+        steps = self.color_steps
+        quantized = colors.astype(np.intp) // step
+        keys = ((radii.astype(np.intp) * steps + quantized[:, 0]) * steps + quantized[:, 1]) * steps
+        keys += quantized[:, 2]
+
+        if keys.max() >= len(self.table):
+            self.grow_table(int(keys.max()) + 1)
+
+        # Only the sprites never seen before are looked up in the cache.
+        missing = keys[~self.known[keys]]
+        for key in np.unique(missing).tolist():
+            code, b = divmod(key, steps)
+            code, g = divmod(code, steps)
+            radius, r = divmod(code, steps)
+            color = (r * step + step // 2, g * step + step // 2, b * step + step // 2)
+            self.table[key] = particle_sprite(self.shape, radius, color)
+            self.known[key] = True
+        sprites = self.table[keys]
+
+        # Some sprites of the table may have been forgotten by the cache, so the
+        # table must forget them too, otherwise the cache would never free memory.
+        if evictions() != self.evictions:
+            self.clear_table()
+            self.evictions = evictions()
+        return sprites
+
+    def clear_table(self):
+        self.table = np.empty(0, object)
+        self.known = np.zeros(0, bool)
+
+    def grow_table(self, size: int):
+        table = np.empty(size, object)
+        known = np.zeros(size, bool)
+        table[: len(self.table)] = self.table
+        known[: len(self.known)] = self.known
+        self.table = table
+        self.known = known
+
+    def draw(
+        self, screen: pygame.Surface, positions: np.ndarray, radii: np.ndarray, colors: np.ndarray
+    ):
+        """
+        Draw the particles.
+
+        Args:
+            positions: array of shape (n, 2), the centers of the particles.
+            radii: array of shape (n,), the radius of each particle, in pixels.
+            colors: array of shape (n, 3), the RGB color of each particle.
+        """
+        if not len(positions):
+            return
+
+        radii = radii.astype(np.intp)
+        sprites = self.sprites(radii, colors).tolist()
+        top_lefts = positions.astype(np.intp) - radii[:, None]
+        # Two flat lists are faster to build than a list of pairs. The batch is
+        # not stored in a list either: a list of thousands of tuples triggers the
+        # garbage collector, which then takes longer than the blits themselves.
+        dests = zip(top_lefts[:, 0].tolist(), top_lefts[:, 1].tolist())
+
+        if hasattr(screen, "fblits"):
+            # pygame-ce has a faster blits, with the flags given once.
+            screen.fblits(zip(sprites, dests), self.special_flags)
+        elif self.special_flags:
+            flags = repeat(self.special_flags)
+            screen.blits(zip(sprites, dests, repeat(None), flags), doreturn=False)
+        else:
+            screen.blits(zip(sprites, dests), doreturn=False)
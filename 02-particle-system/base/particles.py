@@ -0,0 +1,313 @@
+"""
+A pool of particles stored in NumPy arrays.
+
+All the particles of a ParticlePool live in arrays of fixed capacity, one for
+each attribute (position, velocity, age, lifetime, color, size). The live
+particles are always the first [count] of each array: a particle is spawned by
+writing at index [count], and removed by moving the last live particle into
+its slot, so both are O(1) and the arrays never grow or get copied.
+
+The pool is an Object, so it can be added to the State like everything else,
+and all its particles are moved, aged and drawn with a few array operations per frame.
+
+Usage:
+    particles = state.add(ParticlePool())
+    ...
+    # When an asteroid explodes:
+    particles.emit(50, asteroid.center, color=asteroid.color)
+    ...
+    # Debris bouncing on the asteroids:
+    for asteroid, hit in particles.collisions(Asteroid):
+        particles.velocities[hit] *= -1
+"""
+
+from typing import Iterator, Tuple, Type
+
+import numpy as np
+import pygame
+
+# noinspection PyPackages
+from .objects import Object
+# noinspection PyPackages
+from .spatial_hash import cell_spans
+# noinspection PyPackages
+from .utils import SIZE
+
+__all__ = ["ParticlePool"]
+
+Range = Tuple[float, float]
+
+
+class ParticlePool(Object):
+    Z = 2
+
+    def __init__(self, capacity=50_000, gravity=(0, 0), friction=1.0, wrap=True, renderer=None):
+        """
+        Args:
+            capacity: maximum number of particles alive at the same time.
+                New particles are dropped when the pool is full.
+            gravity: acceleration added to all particles each frame.
+            friction: velocity multiplier of all particles each frame.
+            wrap: whether the particles wrap around the screen, like the other objects.
+            renderer: a ParticleRenderer to draw sprites, where the size is the radius.
+                By default, the particles are squares of side size.
+        """
+        self.capacity = capacity
+        self.renderer = renderer
+        self.gravity = np.array(gravity, np.float32)
+        self.friction = friction
+        self.wrap = wrap
+
+        self.count = 0
+        self.positions = np.zeros((capacity, 2), np.float32)
+        self.velocities = np.zeros((capacity, 2), np.float32)
+        self.ages = np.zeros(capacity, np.float32)
+        self.lifetimes = np.ones(capacity, np.float32)
+        self.colors = np.zeros((capacity, 3), np.uint8)
+        self.sizes = np.ones(capacity, np.uint8)
+        self._arrays = (
+            self.positions,
+            self.velocities,
+            self.ages,
+            self.lifetimes,
+            self.colors,
+            self.sizes,
+        )
+
+        super().__init__((0, 0), (0, 0), pygame.Surface((1, 1)))
+
+    def __len__(self):
+        return self.count
+
+    def spawn(self, pos, vel, lifetime: float, color, size=1) -> bool:
+        """Add one particle. Return False if the pool is full."""
+        i = self.count
+        if i >= self.capacity:
+            return False
+        self.positions[i] = pos
+        self.velocities[i] = vel
+        self.ages[i] = 0
+        self.lifetimes[i] = lifetime
+        self.colors[i] = color[:3]
+        self.sizes[i] = size
+        self.count += 1
+        return True
+
+    def emit(
+        self,
+        nb: int,
+        pos,
+        speed: Range = (1, 3),
+        angle: Range = (0, 360),
+        lifetime: Range = (30, 60),
+        color=(255, 255, 255),
+        size: Range = (1, 3),
+        vel=(0, 0),
+    ) -> int:
+        """
+        Add nb particles at pos, with random speeds, directions, lifetimes and sizes
+        in the given ranges. Return how many were added.
+
+        Args:
+            vel: velocity added to all the particles, for instance the velocity of their source.
+        """
+        start = self.count
+        nb = min(nb, self.capacity - start)
+        if nb <= 0:
+            return 0
+        end = start + nb
+
+        radians = np.radians(np.random.uniform(*angle, nb))
+        speeds = np.random.uniform(*speed, nb)
+        self.positions[start:end] = pos
+        self.velocities[start:end, 0] = np.cos(radians) * speeds + vel[0]
+        self.velocities[start:end, 1] = np.sin(radians) * speeds + vel[1]
+        self.ages[start:end] = 0
+        self.lifetimes[start:end] = np.random.uniform(*lifetime, nb)
+        self.colors[start:end] = color[:3]
+        self.sizes[start:end] = np.random.randint(size[0], size[1] + 1, nb)
+        self.count = end
+        return nb
+
+    def kill(self, index: int):
+        """Remove one particle, by moving the last one in its place."""
+        last = self.count - 1
+        for array in self._arrays:
+            array[index] = array[last]
+        self.count = last
+
+    def remove_dead(self):
+        """Remove all the particles that are older than their lifetime."""
+        n = self.count
+        dead = self.ages[:n] >= self.lifetimes[:n]
+        nb_dead = np.count_nonzero(dead)
+        if not nb_dead:
+            return
+
+        # The live particles at the end fill the holes before the new end.
+        new_n = n - nb_dead
+        holes = np.flatnonzero(dead[:new_n])
+        movers = new_n + np.flatnonzero(~dead[new_n:])
+        for array in self._arrays:
+            array[holes] = array[movers]
+        self.count = new_n
+
+    def collisions(self, kind: Type[Object], cell_size=32) -> Iterator[Tuple[Object, np.ndarray]]:
+        """
+        The objects of the given type that some particles touch,
+        with the indices of those particles.
+
+        The objects are found in the spatial hash of the State, and the particles are
+        sorted in a grid of cells, so that only the particles in the cells around
+        each object are checked. Don't kill particles while iterating, as it moves the others.
+        """
+        n = self.count
+        if not n or self.state is None:
+            return
+        spatial_hash = self.state.spatial_hash
+        s = cell_size
+        w, h = spatial_hash.size
+        columns = (w - 1) // s + 1
+
+        positions = self.positions[:n]
+        cells = (positions[:, 1] % h // s).astype(np.intp) * columns
+        cells += (positions[:, 0] % w // s).astype(np.intp)
+        order = np.argsort(cells, kind="stable")
+        sorted_cells = cells[order]
+
+        # The ranges of cells around each object. The cells of a row are contiguous.
+        objects = []
+        centers = []
+        owners = []
+        lows = []
+        highs = []
+        for obj in spatial_hash.objects(kind):
+            if not obj.alive:
+                continue
+            x, y = obj.center
+            r = obj.radius
+            i = len(objects)
+            objects.append(obj)
+            centers.append((x, y, r))
+            x_spans = cell_spans(x - r, x + r, w, s)
+            for y_span in cell_spans(y - r, y + r, h, s):
+                for cy in y_span:
+                    for x_span in x_spans:
+                        owners.append(i)
+                        lows.append(cy * columns + x_span.start)
+                        highs.append(cy * columns + x_span.stop)
+        if not objects:
+            return
+
+        # The particles in all the ranges, found with one search.
+        starts = np.searchsorted(sorted_cells, lows)
+        lengths = np.searchsorted(sorted_cells, highs) - starts
+        total = lengths.sum()
+        if not total:
+            return
+        offsets = np.cumsum(lengths) - lengths
+        candidates = order[np.repeat(starts - offsets, lengths) + np.arange(total)]
+        owners = np.repeat(owners, lengths)
+
+        # Distances wrap around the screen, like in Object.collide.
+        x, y, r = np.array(centers, np.float32)[owners].T
+        dx = np.abs(positions[candidates, 0] - x) % w
+        dy = np.abs(positions[candidates, 1] - y) % h
+        dx = np.minimum(dx, w - dx)
+        dy = np.minimum(dy, h - dy)
+        hit = dx * dx + dy * dy <= r * r
+        candidates = candidates[hit]
+        owners = owners[hit]
+        if not len(candidates):
+            return
+
+        # The hits are grouped by object, in the order of the objects.
+        bounds = np.flatnonzero(np.diff(owners)) + 1
+        starts = [0, *bounds.tolist()]
+        ends = [*bounds.tolist(), len(owners)]
+        for start, end in zip(starts, ends):
+            yield objects[owners[start]], candidates[start:end]
+
+    def logic(self):
+        n = self.count
+        if not n:
+            return
+        velocities = self.velocities[:n]
+        positions = self.positions[:n]
+
+        velocities *= self.friction
+        velocities += self.gravity
+        positions += velocities
+        if self.wrap:
+            positions %= SIZE
+        self.ages[:n] += 1
+
+        self.remove_dead()
+
+    def draw(self, screen: pygame.Surface):
+        n = self.count
+        if not n:
+            return
+
+        xs = self.positions[:n, 0].astype(np.intp)
+        ys = self.positions[:n, 1].astype(np.intp)
+        # The particles fade out with age.
+        fade = 1 - self.ages[:n] / self.lifetimes[:n]
+        colors = (self.colors[:n] * fade[:, None]).astype(np.uint8)
+        sizes = self.sizes[:n]
+
+        if self.renderer is not None:
+            self.renderer.draw(screen, self.positions[:n], sizes, colors)
+            return
+
+        w, h = screen.get_size()
+        if self.wrap:
+            # Particles emitted since the last logic may not be wrapped yet.
+            xs %= w
+            ys %= h
+        else:
+            on_screen = (xs >= 0) & (xs < w) & (ys >= 0) & (ys < h)
+            xs, ys = xs[on_screen], ys[on_screen]
+            colors, sizes = colors[on_screen], sizes[on_screen]
+            if not len(xs):
+                return
+
+        if screen.get_bytesize() == 4:
+            # Writing whole pixels is faster than writing each channel.
+            pixels = pygame.surfarray.pixels2d(screen)
+            colors = map_colors(screen, colors)
+        else:
+            pixels = pygame.surfarray.pixels3d(screen)
+
+        # Each particle is a square of its size. Instead of one draw call per particle,
+        # each pixel of the squares is drawn for all the particles big enough at once.
+        for size in range(1, int(sizes.max()) + 1):
+            if size > 1:
+                big_enough = sizes >= size
+                xs, ys = xs[big_enough], ys[big_enough]
+                colors, sizes = colors[big_enough], sizes[big_enough]
+            # The new pixels of squares of this size: the last column and row.
+            offsets = [(size - 1, oy) for oy in range(size)]
+            offsets += [(ox, size - 1) for ox in range(size - 1)]
+            for ox, oy in offsets:
+                x = xs + ox if ox else xs
+                y = ys + oy if oy else ys
+                if self.wrap:
+                    # The part of the square past the edge is drawn on the other side.
+                    pixels[x % w, y % h] = colors
+                else:
+                    # And it is not drawn if the particles don't wrap.
+                    inside = (x < w) & (y < h)
+                    pixels[x[inside], y[inside]] = colors[inside]
+        del pixels
+
+
+def map_colors(surface: pygame.Surface, colors: np.ndarray) -> np.ndarray:
+    """Vectorized Surface.map_rgb, for an array of RGB colors."""
+    shifts = surface.get_shifts()
+    losses = surface.get_losses()
+    # Opaque, if the surface has an alpha channel.
+    mapped = np.full(len(colors), surface.get_masks()[3], np.uint32)
+    for channel in range(3):
+        mapped |= (colors[:, channel].astype(np.uint32) >> losses[channel]) << shifts[channel]
+    return mapped
@@ -0,0 +1,126 @@
+"""
+Rotated versions of the sprites, computed once and looked up in a table.
+
+Rotating a sprite is slow, and caching the rotations with lru_cache keyed
+on the exact angle does not work well: there are 360 angles for each sprite,
+and each asteroid color is a different sprite. The RotationAtlas instead
+rounds the angles to a fixed number of steps, keeps all the rotations of a
+sprite in a list, and forgets the least recently used sprites when the
+rotations take more memory than the budget.
+
+The rotation for each step is rendered the first time it is needed,
+or for all the steps at once with prerender().
+
+Usage:
+    frame, offset = ROTATIONS.get(sprite, angle)
+    screen.blit(frame, center + offset)
+"""
+
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+
+import pygame
+
+__all__ = ["RotationAtlas", "ROTATIONS"]
+
+Offset = Tuple[int, int]
+
+
+def frame_size(frame: pygame.Surface) -> int:
+    """Number of bytes used by the pixels of a surface."""
+    return frame.get_width() * frame.get_height() * frame.get_bytesize()
+
+
+class SpriteRotations:
+    """All the rotations of one sprite."""
+
+    __slots__ = ("frames", "offsets")
+
+    def __init__(self, steps: int):
+        self.frames: List[Optional[pygame.Surface]] = [None] * steps
+        # Position of the top left of each frame, relative to the center of the sprite.
+        self.offsets: List[Offset] = [(0, 0)] * steps
+
+
+class RotationAtlas:
+    def __init__(self, steps=128, budget=64 * 2 ** 20):
+        """
+        Args:
+            steps: number of rotations of each sprite, evenly spaced.
+            budget: maximum number of bytes used by the rotated sprites.
+        """
+        self.steps = steps
+        self.budget = budget
+        self.memory = 0
+        self.sprites: "OrderedDict[pygame.Surface, SpriteRotations]" = OrderedDict()
+
+    def __len__(self):
+        return len(self.sprites)
+
+    def step(self, angle: float) -> int:
+        """The index of the rotation closest to the angle, in degrees."""
+        return round(angle * self.steps / 360) % self.steps
+
+    def get(self, sprite: pygame.Surface, angle: float) -> Tuple[pygame.Surface, Offset]:
+        """
+        The sprite rotated by angle degrees counterclockwise,
+        and the offset of its top left from its center.
+        """
+        rotations = self.sprites.get(sprite)
+        if rotations is None:
+            rotations = self.sprites[sprite] = SpriteRotations(self.steps)
+        else:
+            self.sprites.move_to_end(sprite)
+
+        i = self.step(angle)
+        frame = rotations.frames[i]
+        if frame is None:
+            frame = self.render(sprite, rotations, i)
+        return frame, rotations.offsets[i]
+
+    def prerender(self, sprite: pygame.Surface):
+        """Render all the rotations of the sprite now, to avoid doing it during the game."""
+        for i in range(self.steps):
+            self.get(sprite, i * 360 / self.steps)
+
+    def render(self, sprite: pygame.Surface, rotations: SpriteRotations, i: int) -> pygame.Surface:
+        frame = pygame.transform.rotate(sprite, i * 360 / self.steps)
+        w, h = frame.get_size()
+        rotations.frames[i] = frame
+        rotations.offsets[i] = -(w // 2), -(h // 2)
+
+        self.memory += frame_size(frame)
+        self.evict(sprite, i)
+        return frame
+
+    def evict(self, sprite: pygame.Surface, i: int):
+        """
+        Forget the least recently used sprites until the memory is below the budget.
+
+        The rotation i of the sprite was just rendered and is kept. If even the rotations
+        of this sprite alone take more than the budget, the other ones are forgotten.
+        """
+        while self.memory > self.budget and len(self.sprites) > 1:
+            oldest = next(iter(self.sprites))
+            if oldest is sprite:
+                self.sprites.move_to_end(oldest)
+            else:
+                self.forget(oldest)
+
+        if self.memory > self.budget:
+            rotations = self.sprites[sprite]
+            for j, frame in enumerate(rotations.frames):
+                if frame is not None and j != i:
+                    self.memory -= frame_size(frame)
+                    rotations.frames[j] = None
+
+    def forget(self, sprite: pygame.Surface):
+        """Remove all the rotations of the sprite."""
+        rotations = self.sprites.pop(sprite)
+        for frame in rotations.frames:
+            if frame is not None:
+                self.memory -= frame_size(frame)
+
+
+# Shared by all the objects, so that the same sprites are rotated only once.
+ROTATIONS = RotationAtlas()
@@ -0,0 +1,148 @@
+"""
+A spatial hash for the objects of the State, on a screen that wraps around.
+
+The screen is split in square cells, and each object is stored in the cell of
+its center, in a separate bucket for each type of object. Finding the Bullets
+that may hit an Asteroid then only looks at the bullets in the few cells
+around it, instead of every object of the State.
+
+As everything wraps around the screen, the cells wrap around too: an object
+near the left edge is close to the ones near the right edge.
+"""
+
+from collections import defaultdict
+from typing import TYPE_CHECKING, Dict, Iterator, List, Set, Tuple, Type
+
+# noinspection PyPackages
+from .utils import SIZE
+
+if TYPE_CHECKING:
+    # objects.py imports this module.
+    # noinspection PyPackages
+    from .objects import Object
+
+__all__ = ["SpatialHash", "cell_spans"]
+
+Cell = Tuple[int, int]
+
+
+def cell_spans(low: float, high: float, length: int, cell_size: int) -> List[range]:
+    """
+    The cells covered by [low, high] along an axis of the given length that wraps around.
+
+    The last cell may be smaller than the others, if length is not a multiple of cell_size,
+    so the parts of the interval on each side of the edge are split before computing the cells.
+    """
+    if high - low >= length:
+        return [range(0, (length - 1) // cell_size + 1)]
+
+    low %= length
+    high %= length
+    first, last = int(low // cell_size), int(high // cell_size)
+    if low <= high:
+        return [range(first, last + 1)]
+    if last >= first:
+        # It goes over the edge and back in the first cell.
+        return [range(0, (length - 1) // cell_size + 1)]
+    # It goes over the edge.
+    return [
+        range(first, (length - 1) // cell_size + 1),
+        range(0, last + 1),
+    ]
+
+
+class SpatialHash:
+    def __init__(self, cell_size=64, size=SIZE):
+        """
+        Args:
+            cell_size: size of the cells, in pixels. About the size of
+                the largest objects is good.
+            size: size of the world, where the objects wrap around.
+        """
+        self.cell_size = cell_size
+        self.size = size
+        self.buckets: Dict[Type, Dict[Cell, Set["Object"]]] = defaultdict(lambda: defaultdict(set))
+        # The cell of each object, to find it again when it moves or is removed.
+        self.cells: Dict["Object", Cell] = {}
+        # The largest radius of each type, as the objects are stored only by their center.
+        self.max_radius: Dict[Type, float] = defaultdict(float)
+
+    def __len__(self):
+        return len(self.cells)
+
+    def __contains__(self, obj):
+        return obj in self.cells
+
+    def cell_of(self, pos) -> Cell:
+        s = self.cell_size
+        return int(pos[0] % self.size[0] // s), int(pos[1] % self.size[1] // s)
+
+    def add(self, obj: "Object"):
+        if obj in self.cells:
+            self.remove(obj)
+        kind = type(obj)
+        cell = self.cell_of(obj.center)
+        self.cells[obj] = cell
+        self.buckets[kind][cell].add(obj)
+        self.max_radius[kind] = max(self.max_radius[kind], obj.radius)
+
+    def remove(self, obj: "Object"):
+        cell = self.cells.pop(obj)
+        bucket = self.buckets[type(obj)]
+        bucket[cell].discard(obj)
+        if not bucket[cell]:
+            del bucket[cell]
+
+    def move(self, obj: "Object"):
+        """Put the object in the cell of its new position. Call it each time it moves."""
+        old = self.cells.get(obj)
+        if old is None:
+            # Not added yet.
+            return
+        new = self.cell_of(obj.center)
+        if new != old:
+            bucket = self.buckets[type(obj)]
+            bucket[old].discard(obj)
+            if not bucket[old]:
+                del bucket[old]
+            bucket[new].add(obj)
+            self.cells[obj] = new
+
+    def kinds(self, kind: Type) -> List[Type]:
+        """The types of the objects stored that are kind or a subclass of it."""
+        return [k for k in self.buckets if issubclass(k, kind)]
+
+    def objects(self, kind: Type) -> Iterator["Object"]:
+        """All the objects of the given type."""
+        for k in self.kinds(kind):
+            for bucket in self.buckets[k].values():
+                yield from bucket
+
+    def query(self, pos, radius: float, kind: Type) -> Iterator["Object"]:
+        """
+        The objects of the given type that may be at most radius pixels away from pos.
+
+        This yields all the objects in the cells around pos, so the caller still
+        needs to check the exact distance, for instance with Object.collide().
+        """
+        x, y = pos
+        w, h = self.size
+        s = self.cell_size
+        for k in self.kinds(kind):
+            bucket = self.buckets[k]
+            r = radius + self.max_radius[k]
+            xs = cell_spans(x - r, x + r, w, s)
+            ys = cell_spans(y - r, y + r, h, s)
+            for x_span in xs:
+                for cx in x_span:
+                    for y_span in ys:
+                        for cy in y_span:
+                            objects = bucket.get((cx, cy))
+                            if objects:
+                                yield from objects
+
+    def colliding(self, obj: "Object", kind: Type) -> Iterator["Object"]:
+        """The alive objects of the given type that collide with obj."""
+        for other in self.query(obj.center, obj.radius, kind):
+            if other.alive and other is not obj and obj.collide(other):
+                yield other
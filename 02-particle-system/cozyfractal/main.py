@@ -90,6 +90,7 @@ def mainloop():
         angle = Gauss(90, 5)
         acceleration = -0.004
         radius = lambda age: chrange(age, (0, 200), (2, 4), flipped=True)
+        fused = True
 
     class EdgeBubbles(ParticleGroup, SurfComponent, Aim, Friction):
         continuous = True
@@ -102,6 +103,7 @@ def mainloop():
         max_age = 50
         radius = lambda age: chrange(age, (0, 50), (2, 10), 0.5, True)
         friction = 0.99
+        fused = True
 
         colors = 50
         start_gradient = particles.gradient(
@@ -1,4 +1,6 @@
-from typing import Type
+import time
+from collections import defaultdict
+from typing import Callable, Dict, List, Optional, Tuple, Type
 
 import numpy as np
 import pygame
@@ -21,16 +23,40 @@ class Component:
     def logic(self: "ParticleGroup"):
         pass
 
+    def fused_logic(self: "ParticleGroup") -> Optional[Callable[[], None]]:
+        """
+        Return a function that does the same as logic, but without allocating arrays.
+
+        It is called once per group, so the buffers it needs can be allocated there.
+        The attributes of the group, arrays and settings alike, must still be read
+        from self in the function, as they can be replaced or changed afterwards.
+        Return None if there is no faster version.
+        """
+        return None
+
     def draw(self: "ParticleGroup", screen):
         pass
 
 
 class ParticleGroup:
+    """
+    A group of particles, whose behavior is given by the Components it inherits from.
+
+    Controls:
+     - [r] Reset the group
+     - [t] Toggles the timing of each component, and prints a report when turned off.
+    """
+
     Z = 0
     nb = 1000
     max_age = 100
     continuous = False
     nb_seed = 1
+    # Use the fused_logic of the components, that works in preallocated buffers.
+    # Each component still does its own NumPy passes, they are not merged in one kernel.
+    fused = False
+    # Measure the time taken by each component.
+    timed = False
 
     seeds: np.array
     age: np.array
@@ -58,9 +84,53 @@ class ParticleGroup:
             else:
                 setattr(self, key, value)
 
+        self.dead = np.zeros(self.nb, dtype=bool)
+        self.logic_chain = self.compile_logic()
+        self.draw_chain = [
+            (f"{base.__name__}.draw", base.draw)
+            for base in self._get_components()
+            if base.draw is not Component.draw
+        ]
+        # Total time in seconds of each component, and number of frames measured.
+        self.timings: Dict[str, float] = defaultdict(float)
+        self.timed_frames = 0
+
     def __repr__(self):
         return f"<{self.__class__.__name__}({self.init})>"
 
+    @classmethod
+    def _get_components(cls) -> List[Type[Component]]:
+        return [base for base in cls.__bases__ if issubclass(base, Component)]
+
+    def compile_logic(self) -> List[Tuple[str, Callable[[], None]]]:
+        """
+        The logic of each component, in order, as functions without arguments.
+
+        When the group is fused, the components use their fused_logic if they have one.
+        Each component stays a separate function, run one after the other.
+        The components that have no logic are skipped.
+        """
+        chain = []
+        for base in self._get_components():
+            if base.logic is Component.logic:
+                continue
+            kernel = base.fused_logic(self) if self.fused else None
+            if kernel is None:
+                kernel = base.logic.__get__(self)
+            chain.append((f"{base.__name__}.logic", kernel))
+        return chain
+
+    def timing_report(self) -> str:
+        """The average time taken by each component per frame, slowest first."""
+        frames = max(1, self.timed_frames)
+        total = sum(self.timings.values()) or 1
+        group = self.__class__.__name__
+        lines = [f"{group} over {self.timed_frames} frames, fused={self.fused}:"]
+        for name, duration in sorted(self.timings.items(), key=lambda item: -item[1]):
+            per_frame = duration / frames * 1000
+            lines.append(f"  {name:<30} {per_frame:7.3f} ms  {duration / total:6.1%}")
+        return "\n".join(lines)
+
     @classmethod
     def _get_all_from_bases(cls, what: str):
         collec = ()
@@ -99,15 +169,25 @@ class ParticleGroup:
             if event.key == pygame.K_r:
                 # Reset
                 self.__init__(**self.init)
+            elif event.key == pygame.K_t:
+                if self.timed:
+                    print(self.timing_report())
+                self.timed = not self.timed
+                self.timings.clear()
+                self.timed_frames = 0
 
         for base in self.__class__.__bases__:
             if issubclass(base, Component):
                 base.handle_event(self, event)
 
     def logic(self):
+        start = time.perf_counter()
         self.age += 1
 
-        dead = self.age >= self.max_age
+        if self.fused:
+            dead = np.greater_equal(self.age, self.max_age, out=self.dead)
+        else:
+            dead = self.age >= self.max_age
         nb_dead = np.count_nonzero(dead)
 
         if self.continuous:
@@ -118,11 +198,23 @@ class ParticleGroup:
             self.alive = False
             return
 
-        for base in self.__class__.__bases__:
-            if issubclass(base, Component):
-                base.logic(self)
+        if self.timed:
+            self.timed_frames += 1
+            self.timings["ParticleGroup.logic"] += time.perf_counter() - start
+            for name, kernel in self.logic_chain:
+                start = time.perf_counter()
+                kernel()
+                self.timings[name] += time.perf_counter() - start
+        else:
+            for name, kernel in self.logic_chain:
+                kernel()
 
     def draw(self, screen: pygame.Surface):
-        for base in self.__class__.__bases__:
-            if issubclass(base, Component):
-                base.draw(self, screen)
+        if self.timed:
+            for name, draw in self.draw_chain:
+                start = time.perf_counter()
+                draw(self, screen)
+                self.timings[name] += time.perf_counter() - start
+        else:
+            for name, draw in self.draw_chain:
+                draw(self, screen)
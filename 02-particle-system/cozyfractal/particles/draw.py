@@ -73,8 +73,10 @@ class SurfComponent(ABC, Component):
     def draw(self, screen: pygame.Surface):
         params = self.compute_params()
         surfs = self.table[params]
-        l = zip(surfs, self.pos)
-        screen.blits(l, False)
+        # Python lists are much faster to go through than numpy arrays,
+        # and blits doesn't need a list of pairs, an iterator is enough.
+        pos = zip(self.pos[:, 0].tolist(), self.pos[:, 1].tolist())
+        screen.blits(zip(surfs.tolist(), pos), False)
 
     @classmethod
     @abstractmethod
@@ -29,6 +29,23 @@ class MovePolar(Component):
         radians = self.angle * (np.pi / 180)
         self.pos += (self.speed * np.array([np.cos(radians), np.sin(radians)])).T
 
+    def fused_logic(self: "ParticleGroup"):
+        radians = np.empty(self.nb)
+        dx = np.empty(self.nb)
+        dy = np.empty(self.nb)
+
+        def move_polar():
+            np.multiply(self.angle, np.pi / 180, out=radians)
+            np.cos(radians, out=dx)
+            np.sin(radians, out=dy)
+            np.multiply(dx, self.speed, out=dx)
+            np.multiply(dy, self.speed, out=dy)
+            pos = self.pos
+            pos[:, 0] += dx
+            pos[:, 1] += dy
+
+        return move_polar
+
 
 class MoveCartesian(Component):
     """Move particles according to a velocity in cartesian coordinates."""
@@ -51,6 +68,32 @@ class WrapTorus(Component):
         self.pos %= self.wrap_rect[2:]
         self.pos += self.wrap_rect[:2]
 
+    def fused_logic(self: "ParticleGroup"):
+        topleft = np.empty(2)
+        size = np.empty(2)
+        bottomright = np.empty(2)
+        outside = np.empty((self.nb, 2), dtype=bool)
+        over = np.empty((self.nb, 2), dtype=bool)
+
+        def wrap_torus():
+            # Converted once per frame, instead of at each operation.
+            topleft[:] = self.wrap_rect[:2]
+            size[:] = self.wrap_rect[2:]
+            np.add(topleft, size, out=bottomright)
+
+            # Most particles are inside, and the modulo is slow,
+            # so it is only computed for the particles outside.
+            pos = self.pos
+            np.less(pos, topleft, out=outside)
+            np.greater_equal(pos, bottomright, out=over)
+            np.logical_or(outside, over, out=outside)
+            if outside.any():
+                rows, axes = np.nonzero(outside)
+                corner = topleft[axes]
+                pos[rows, axes] = (pos[rows, axes] - corner) % size[axes] + corner
+
+        return wrap_torus
+
 
 class AngularVel(Component):
     """Increase the angle of a particle by a constant."""
@@ -73,6 +116,15 @@ class Gravity(Component):
     def logic(self: "ParticleGroup"):
         self.velocity += self.gravity
 
+    def fused_logic(self: "ParticleGroup"):
+        gravity = np.empty(2)
+
+        def apply_gravity():
+            gravity[:] = self.gravity
+            self.velocity += gravity
+
+        return apply_gravity
+
 
 class Friction(Component):
     """Multiply the speed by a constant amount"""
@@ -146,3 +198,22 @@ class Aim(Component):
         direction *= self.speed[..., None]
 
         self.pos += direction
+
+    def fused_logic(self: "ParticleGroup"):
+        aim = np.empty(2)
+        direction = np.empty((self.nb, 2))
+        squares = np.empty((self.nb, 2))
+        norm = np.empty(self.nb)
+
+        def move_to_aim():
+            aim[:] = self.aim
+            np.subtract(aim, self.pos, out=direction)
+            np.multiply(direction, direction, out=squares)
+            np.add(squares[:, 0], squares[:, 1], out=norm)
+            np.sqrt(norm, out=norm)
+            np.divide(direction, norm[..., None], out=direction)
+            np.multiply(direction, self.speed[..., None], out=direction)
+
+            self.pos += direction
+
+        return move_to_aim
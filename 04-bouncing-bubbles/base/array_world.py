@@ -0,0 +1,326 @@
+"""
+A World where all the bubbles are stored in NumPy arrays.
+
+Instead of each Bubble owning its own Vector2s and Color, the positions,
+velocities, radii, masses and colors of all the bubbles are kept in
+contiguous arrays, and each step of the simulation (move, walls, mouse,
+collisions) is done for all the bubbles at once with array operations.
+
+Unlike the World of main.py, where they are left to do, the bubbles bounce
+on the walls and on each other: the pairs found by the broadphase are all
+checked and resolved at once.
+"""
+
+from typing import Iterable, Tuple
+
+import numpy as np
+import pygame
+
+from .utils import SIZE, chrange
+
+__all__ = ["ArrayWorld", "BubbleView"]
+
+
+class BubbleView:
+    """
+    A Bubble-like object that reads and writes the data of one bubble of an ArrayWorld.
+
+    The vectors returned are copies: to modify the position or velocity of the bubble,
+    assign them back, for instance `view.velocity = view.velocity * 2`.
+    """
+
+    __slots__ = ("world", "index")
+
+    def __init__(self, world: "ArrayWorld", index: int):
+        self.world = world
+        self.index = index
+
+    def __repr__(self):
+        return f"<BubbleView({self.index}, pos={tuple(self.position)}, radius={self.radius})>"
+
+    @property
+    def position(self):
+        return pygame.Vector2(*self.world.positions[self.index])
+
+    @position.setter
+    def position(self, value):
+        self.world.positions[self.index] = tuple(value)
+
+    @property
+    def velocity(self):
+        return pygame.Vector2(*self.world.velocities[self.index])
+
+    @velocity.setter
+    def velocity(self, value):
+        self.world.velocities[self.index] = tuple(value)
+
+    @property
+    def radius(self):
+        return int(self.world.radii[self.index])
+
+    @property
+    def mass(self):
+        return float(self.world.masses[self.index])
+
+    @property
+    def color(self):
+        return pygame.Color(*self.world.colors[self.index].tolist())
+
+    def draw(self, screen: pygame.Surface):
+        pygame.draw.circle(screen, self.color, self.position, self.radius)
+
+
+class ArrayWorld:
+    """
+    A drop-in replacement for World that uses arrays instead of Bubble objects.
+
+    It can be iterated, indexed and appended to like the list based World,
+    but it gives BubbleView objects instead of Bubbles.
+    """
+
+    # Strength of the force that pushes appart overlapping bubbles,
+    # proportional to the overlap.
+    SEPARATION = 0.05
+
+    def __init__(self, bubbles: Iterable = (), max_velocity=7, capacity=64, use_broadphase=True):
+        """
+        Args:
+            bubbles: Bubble-like objects to copy into the world.
+            max_velocity: The maximum speed of each bubble.
+            capacity: How many bubbles can be stored before the arrays need to grow.
+            use_broadphase: If False, every pair of bubbles is checked for collisions.
+        """
+        self.max_velocity = max_velocity
+        self.use_broadphase = use_broadphase
+        self.size = 0
+        self._allocate(capacity)
+
+        for bubble in bubbles:
+            self.append(bubble)
+
+    def _allocate(self, capacity):
+        """Create the arrays with the given capacity, keeping the current bubbles."""
+        old = getattr(self, "_buffers", None)
+        self._buffers = {
+            "positions": np.zeros((capacity, 2)),
+            "velocities": np.zeros((capacity, 2)),
+            "radii": np.zeros(capacity),
+            "masses": np.zeros(capacity),
+            "colors": np.zeros((capacity, 4), dtype=np.uint8),
+        }
+        if old is not None:
+            for name, array in old.items():
+                self._buffers[name][: self.size] = array[: self.size]
+
+    # The arrays are views of the buffers, restricted to the bubbles that exist.
+
+    @property
+    def positions(self) -> np.ndarray:
+        return self._buffers["positions"][: self.size]
+
+    @property
+    def velocities(self) -> np.ndarray:
+        return self._buffers["velocities"][: self.size]
+
+    @property
+    def radii(self) -> np.ndarray:
+        return self._buffers["radii"][: self.size]
+
+    @property
+    def masses(self) -> np.ndarray:
+        return self._buffers["masses"][: self.size]
+
+    @property
+    def colors(self) -> np.ndarray:
+        return self._buffers["colors"][: self.size]
+
+    def __len__(self):
+        return self.size
+
+    def __getitem__(self, index):
+        if not -self.size <= index < self.size:
+            raise IndexError(index)
+        return BubbleView(self, index % self.size)
+
+    def __iter__(self):
+        return (BubbleView(self, i) for i in range(self.size))
+
+    def append(self, bubble):
+        """Copy a Bubble-like object in the world."""
+        capacity = len(self._buffers["radii"])
+        if self.size == capacity:
+            self._allocate(capacity * 2)
+
+        i = self.size
+        self.size += 1
+        self.positions[i] = tuple(bubble.position)
+        self.velocities[i] = tuple(bubble.velocity)
+        self.radii[i] = bubble.radius
+        self.masses[i] = bubble.radius ** 2
+        self.colors[i] = tuple(pygame.Color(bubble.color))
+
+    def logic(self, mouse_position: pygame.Vector2):
+        """Handles the collision and evolution of all the bubbles."""
+        if not self.size:
+            return
+
+        self.move()
+        self.collide_borders()
+        self.move_away_from_mouse(mouse_position)
+
+        first, second = self.candidate_pairs()
+        self.resolve_collisions(first, second)
+
+    def move(self):
+        """Move the bubbles according to their velocity, limited to max_velocity."""
+        velocities = self.velocities
+        speed = np.hypot(velocities[:, 0], velocities[:, 1])
+        too_fast = speed > self.max_velocity
+        velocities[too_fast] *= (self.max_velocity / speed[too_fast])[:, None]
+
+        positions = self.positions
+        positions += velocities
+
+    def collide_borders(self):
+        """Bounce on the walls, but only if the bubble is moving towards the wall."""
+        positions = self.positions
+        velocities = self.velocities
+        radii = self.radii
+        for axis in (0, 1):
+            pos = positions[:, axis]
+            vel = velocities[:, axis]
+            hit = ((pos < radii) & (vel < 0)) | ((pos > SIZE[axis] - radii) & (vel > 0))
+            vel[hit] *= -1
+
+    def move_away_from_mouse(self, mouse_position):
+        """Apply a force on the bubbles to move away from the mouse."""
+        to_mouse = np.array(tuple(mouse_position)) - self.positions
+        distance = np.hypot(to_mouse[:, 0], to_mouse[:, 1])
+        close = (0 < distance) & (distance < 200)
+
+        distance = distance[close]
+        strength = chrange(distance, (0, 200), (1, 0), power=2)
+        self.velocities[close] -= to_mouse[close] * (strength / distance)[:, None]
+
+    def candidate_pairs(self) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Return the indices of the pairs of bubbles that may collide.
+
+        This is the same idea as the UniformGrid, but for arrays:
+        the bubbles are sorted by cell, and each bubble is paired with all the bubbles
+        that are after it in its cell, and all the ones in half of the neighbouring cells.
+        """
+        if not self.use_broadphase:
+            return np.triu_indices(self.size, 1)
+
+        positions = self.positions
+        cell_size = max(1.0, 2 * self.radii.max())
+        cols = int(SIZE[0] // cell_size) + 1
+        rows = int(SIZE[1] // cell_size) + 1
+
+        # Bubbles out of the screen are put in the border cells.
+        # They may be paired with bubbles that are far away, but it doesn't
+        # matter as the pairs are checked afterwards.
+        cells = np.floor_divide(positions, cell_size).astype(np.intp)
+        np.clip(cells[:, 0], 0, cols - 1, out=cells[:, 0])
+        np.clip(cells[:, 1], 0, rows - 1, out=cells[:, 1])
+        keys = cells[:, 1] * cols + cells[:, 0]
+
+        order = np.argsort(keys, kind="stable")
+        counts = np.bincount(keys, minlength=cols * rows)
+        starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+
+        firsts = []
+        seconds = []
+
+        # Pairs inside the same cell: each bubble with the next ones in its cell.
+        sorted_keys = keys[order]
+        rank = np.arange(self.size)
+        ends = starts[sorted_keys] + counts[sorted_keys]
+        self._expand_ranges(order, rank + 1, ends, firsts, seconds)
+
+        # Pairs with the neighbouring cells.
+        x = cells[order, 0]
+        y = cells[order, 1]
+        for dx, dy in ((1, 0), (-1, 1), (0, 1), (1, 1)):
+            valid = (0 <= x + dx) & (x + dx < cols) & (y + dy < rows)
+            neighbour = sorted_keys[valid] + dy * cols + dx
+            start = starts[neighbour]
+            self._expand_ranges(order[valid], start, start + counts[neighbour], firsts, seconds)
+
+        if not firsts:
+            empty = np.zeros(0, dtype=np.intp)
+            return empty, empty
+
+        first = np.concatenate(firsts)
+        second = order[np.concatenate(seconds)]
+        return first, second
+
+    @staticmethod
+    def _expand_ranges(bubbles, starts, ends, firsts, seconds):
+        """Pair each bubble with every index in [start, end[, in a vectorized way."""
+        lengths = np.maximum(ends - starts, 0)
+        total = lengths.sum()
+        if total == 0:
+            return
+
+        # Index of the range in which each output element is.
+        owner = np.repeat(np.arange(len(lengths)), lengths)
+        # Position of each output element inside its range.
+        offsets = np.arange(total) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+
+        firsts.append(bubbles[owner])
+        seconds.append(starts[owner] + offsets)
+
+    def resolve_collisions(self, first: np.ndarray, second: np.ndarray):
+        """Apply an elastic bounce and a separating force to each pair of overlapping bubbles."""
+        positions = self.positions
+        radii = self.radii
+
+        delta = positions[second] - positions[first]
+        distance = np.hypot(delta[:, 0], delta[:, 1])
+        overlap = radii[first] + radii[second] - distance
+        colliding = overlap > 0
+        if not colliding.any():
+            return
+
+        first = first[colliding]
+        second = second[colliding]
+        delta = delta[colliding]
+        distance = distance[colliding]
+        overlap = overlap[colliding]
+
+        # Bubbles at the exact same position are pushed appart horizontally.
+        same = distance == 0
+        delta[same] = (1, 0)
+        distance[same] = 1
+        normal = delta / distance[:, None]
+
+        velocities = self.velocities
+        masses = self.masses
+        relative_velocity = velocities[second] - velocities[first]
+        approach_speed = np.einsum("ij,ij->i", relative_velocity, normal)
+
+        # Only bounce if the bubbles are not already going away from each other.
+        inv_mass_1 = 1 / masses[first]
+        inv_mass_2 = 1 / masses[second]
+        impulse = np.where(approach_speed < 0, -2 * approach_speed / (inv_mass_1 + inv_mass_2), 0)
+        # Gently push the overlapping bubbles away from each other.
+        impulse += self.SEPARATION * overlap / (inv_mass_1 + inv_mass_2)
+
+        push = normal * impulse[:, None]
+        # All collisions are applied at once, so that a bubble can have many collisions.
+        for axis in (0, 1):
+            velocities[:, axis] -= np.bincount(
+                first, push[:, axis] * inv_mass_1, minlength=self.size
+            )
+            velocities[:, axis] += np.bincount(
+                second, push[:, axis] * inv_mass_2, minlength=self.size
+            )
+
+    def draw(self, screen: pygame.Surface):
+        circle = pygame.draw.circle
+        for color, position, radius in zip(
+            self.colors.tolist(), self.positions.tolist(), self.radii.tolist()
+        ):
+            circle(screen, color, position, radius)
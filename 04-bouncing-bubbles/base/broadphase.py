@@ -0,0 +1,98 @@
+"""
+Broadphase collision detection.
+
+Checking every pair of bubbles is O(n²): with a few hundred bubbles,
+most of the frame is spent comparing bubbles that are on opposite
+sides of the screen. A broadphase quickly finds the pairs of objects
+that *may* collide, so that the precise (and slower) check is only
+done on those.
+
+Everything here works with any object that has a `position` (a Vector2
+or any pair of numbers) and a `radius`.
+"""
+
+from itertools import combinations, islice
+from typing import Dict, Iterable, Iterator, List, Tuple, TypeVar
+
+__all__ = ["UniformGrid", "brute_force_pairs"]
+
+T = TypeVar("T")
+
+
+def brute_force_pairs(objects: Iterable[T]) -> Iterator[Tuple[T, T]]:
+    """Yield every pair of objects once. Simple, but O(n²)."""
+    return combinations(objects, 2)
+
+
+class UniformGrid:
+    """
+    A spatial hash that splits the plane into square cells of the same size.
+
+    Each object is stored in the single cell that contains its center.
+    The cells are at least as large as the largest possible collision distance
+    (two times the largest radius), so two objects can only collide if they
+    are in the same cell or in neighbouring cells.
+
+    The grid is meant to be rebuilt every frame, which costs O(n),
+    and finding the candidate pairs is then roughly linear in the number
+    of objects, as long as they are not all piled up in the same cell.
+    """
+
+    # Half of the 8 neighbours of a cell. Visiting only those from each cell
+    # visits every pair of neighbouring cells exactly once.
+    HALF_NEIGHBOURS = ((1, 0), (-1, 1), (0, 1), (1, 1))
+
+    def __init__(self, min_cell_size: float = 1):
+        """
+        Args:
+            min_cell_size: lower bound for the size of the cells.
+                The actual size is adapted to the largest object on each rebuild.
+        """
+        self.min_cell_size = min_cell_size
+        self.cell_size = min_cell_size
+        self.cells: Dict[Tuple[int, int], List] = {}
+
+    def __len__(self):
+        return sum(len(cell) for cell in self.cells.values())
+
+    def cell_of(self, position) -> Tuple[int, int]:
+        """Return the coordinates of the cell containing the given position."""
+        return int(position[0] // self.cell_size), int(position[1] // self.cell_size)
+
+    def rebuild(self, objects: Iterable):
+        """Empty the grid and insert all the objects in it."""
+        objects = list(objects)
+        self.cells.clear()
+        if not objects:
+            return
+
+        largest_radius = max(obj.radius for obj in objects)
+        self.cell_size = max(self.min_cell_size, 2 * largest_radius)
+
+        cells = self.cells
+        size = self.cell_size
+        for obj in objects:
+            key = int(obj.position[0] // size), int(obj.position[1] // size)
+            cell = cells.get(key)
+            if cell is None:
+                cells[key] = [obj]
+            else:
+                cell.append(obj)
+
+    def candidate_pairs(self) -> Iterator[Tuple]:
+        """Yield each pair of objects that are close enough to collide, once."""
+        cells = self.cells
+        for (x, y), cell in cells.items():
+            # Pairs inside the same cell.
+            for i, first in enumerate(cell):
+                for second in islice(cell, i + 1, None):
+                    yield first, second
+
+            # Pairs with the neighbouring cells.
+            for dx, dy in self.HALF_NEIGHBOURS:
+                neighbour = cells.get((x + dx, y + dy))
+                if neighbour is None:
+                    continue
+                for first in cell:
+                    for second in neighbour:
+                        yield first, second
@@ -13,6 +13,7 @@ __package__ = "04-bouncing-bubbles." + Path(__file__).absolute().parent.name
 # To import the modules in yourname/, you need to use relative imports,
 # otherwise your project will not be compatible with the showcase.
 from .utils import *
+from .broadphase import UniformGrid, brute_force_pairs
 
 BACKGROUND = 0x0F1012
 NB_BUBBLES = 42
@@ -145,9 +146,21 @@ class Collision:
 
 # The world is a list of bubbles.
 class World(List[Bubble]):
-    def __init__(self, nb):
+    def __init__(self, nb, use_broadphase=True):
         super().__init__(Bubble() for _ in range(nb))
 
+        # The broadphase finds quickly which bubbles are close enough to collide.
+        # It can be disabled to compare with checking every pair of bubbles.
+        self.use_broadphase = use_broadphase
+        self.grid = UniformGrid()
+
+    def candidate_pairs(self):
+        """Return the pairs of bubbles that may collide."""
+        if self.use_broadphase:
+            self.grid.rebuild(self)
+            return self.grid.candidate_pairs()
+        return brute_force_pairs(self)
+
     def logic(self, mouse_position: pygame.Vector2):
         """Handles the collision and evolution of all the objects."""
 
@@ -160,13 +173,12 @@ class World(List[Bubble]):
             bubble.collide_borders()
             bubble.move_away_from_mouse(mouse_position)
 
-        # Then we check each pair of bubbles to collect all collisions.
+        # Then we check each pair of bubbles that are close enough to collect all collisions.
         collisions = []
-        for i, b1 in enumerate(self):
-            for b2 in self[i + 1 :]:
-                collision = b1.collide(b2)
-                if collision:
-                    collisions.append(collision)
+        for b1, b2 in self.candidate_pairs():
+            collision = b1.collide(b2)
+            if collision:
+                collisions.append(collision)
 
         # And finally we resolve them all at once, so that it doesn't impact the detection of collision.
         for collision in collisions:
@@ -177,6 +189,23 @@ class World(List[Bubble]):
             bubble.draw(screen)
 
 
+def switch_world_backend(world):
+    """Convert a World into an ArrayWorld, or an ArrayWorld back into a World."""
+    if isinstance(world, World):
+        from .array_world import ArrayWorld
+
+        return ArrayWorld(world, Bubble.MAX_VELOCITY, use_broadphase=world.use_broadphase)
+
+    new_world = World(0, world.use_broadphase)
+    for view in world:
+        bubble = Bubble(view.position)
+        bubble.velocity = view.velocity
+        bubble.radius = view.radius
+        bubble.color = view.color
+        new_world.append(bubble)
+    return new_world
+
+
 def mainloop():
     pygame.init()
 
@@ -194,6 +223,13 @@ def mainloop():
                 mouse_position.xy = event.pos
             elif event.type == pygame.MOUSEBUTTONDOWN:
                 world.append(Bubble(event.pos))
+            elif event.type == pygame.KEYDOWN and event.key == pygame.K_b:
+                world.use_broadphase = not world.use_broadphase
+                debug.text("Broadphase:", world.use_broadphase)
+            elif event.type == pygame.KEYDOWN and event.key == pygame.K_n:
+                world = switch_world_backend(world)
+                fps_counter.counters["Bubbles"] = world
+                debug.text("Backend:", type(world).__name__)
             debug.handle_event(event)
             fps_counter.handle_event(event)
 
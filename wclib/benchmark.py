@@ -0,0 +1,330 @@
+"""
+Headless benchmark of the challenge entries.
+
+Each entry is run without a window (with the SDL dummy video driver)
+for a fixed number of frames with the same scripted events,
+and the time taken by each frame is recorded.
+Every entry runs in its own process, so that the import time and
+the memory used are its own, and so that a crash doesn't stop the benchmark.
+
+Usage, from the root of the repository:
+    python -m wclib.benchmark [--frames 600] [--output report.json]
+        [challenge or challenge/entry ...]
+
+Without any challenge or entry, all the entries of all the challenges are run.
+The report is written as CSV if the output ends with .csv, and as JSON otherwise.
+Instead of the scripted events, the events of a recording (see wclib.replay)
+can be used with --replay, and --fixed-step makes every Clock.tick() return
+the same time step, for runs that are exactly reproducible.
+"""
+
+import argparse
+import csv
+import json
+import math
+import os
+import subprocess
+import sys
+import time
+import traceback
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+import pygame
+
+from .constants import SIZE, ROOT_DIR
+from .core import Entry, get_challenges, get_entries
+from .replay import EventPlayer, fix_time_step, patch_clock, seed_everything
+
+__all__ = [
+    "scripted_events",
+    "UncappedClock",
+    "percentile",
+    "benchmark_entry",
+    "benchmark_in_subprocess",
+    "write_report",
+    "main",
+]
+
+# The line printed by the child processes just before their results.
+# Entries may print anything else on stdout, so we need to find it.
+RESULT_MARKER = "WCLIB-BENCHMARK-RESULT:"
+
+REPORT_FIELDS = [
+    "entry",
+    "frames",
+    "import_time",
+    "first_frame_time",
+    "mean",
+    "p50",
+    "p95",
+    "p99",
+    "max",
+    "peak_rss_mb",
+    "error",
+]
+
+
+def scripted_events(frame: int, size=SIZE) -> List[pygame.event.Event]:
+    """
+    Events sent to the entries on a given frame.
+
+    The mouse moves smoothly across the whole screen, and clicks every second.
+    The events are always the same for a given frame, so that all the entries
+    and all the runs get exactly the same input.
+    """
+    w, h = size
+    t = frame / 60
+    pos = (
+        int(w / 2 + w * 0.4 * math.sin(t * 0.9)),
+        int(h / 2 + h * 0.4 * math.sin(t * 1.3)),
+    )
+    previous_t = (frame - 1) / 60
+    previous = (
+        int(w / 2 + w * 0.4 * math.sin(previous_t * 0.9)),
+        int(h / 2 + h * 0.4 * math.sin(previous_t * 1.3)),
+    )
+    rel = (pos[0] - previous[0], pos[1] - previous[1])
+
+    events = [pygame.event.Event(pygame.MOUSEMOTION, pos=pos, rel=rel, buttons=(0, 0, 0))]
+    if frame % 60 == 30:
+        events.append(pygame.event.Event(pygame.MOUSEBUTTONDOWN, pos=pos, button=1))
+    elif frame % 60 == 35:
+        events.append(pygame.event.Event(pygame.MOUSEBUTTONUP, pos=pos, button=1))
+
+    return events
+
+
+class UncappedClock:
+    """
+    A replacement for pygame.time.Clock that never waits.
+
+    Most entries cap their framerate with Clock.tick(60),
+    which would hide how long their frames really take.
+    """
+
+    def __init__(self):
+        self._clock = pygame.time._Clock()
+
+    def tick(self, framerate=0):
+        return self._clock.tick()
+
+    def tick_busy_loop(self, framerate=0):
+        return self._clock.tick()
+
+    def __getattr__(self, item):
+        return getattr(self._clock, item)
+
+
+def uncap_framerate():
+    """Make every Clock created from now on an UncappedClock."""
+    patch_clock(UncappedClock)
+
+
+def percentile(sorted_values: List[float], p: float) -> float:
+    """Return the p-th percentile of already sorted values, with linear interpolation."""
+    if not sorted_values:
+        return math.nan
+
+    k = (len(sorted_values) - 1) * p / 100
+    below = math.floor(k)
+    above = math.ceil(k)
+    return sorted_values[below] + (sorted_values[above] - sorted_values[below]) * (k - below)
+
+
+def peak_rss_mb() -> Optional[float]:
+    """Return the maximum memory used by this process so far, in MiB, if available."""
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux gives kilobytes, but macOS gives bytes.
+    if sys.platform == "darwin":
+        return peak / 2 ** 20
+    return peak / 2 ** 10
+
+
+def benchmark_entry(
+    entry: Entry,
+    frames: int = 600,
+    events: Callable[[int], List[pygame.event.Event]] = scripted_events,
+    seed: int = 0,
+) -> Dict:
+    """
+    Run an entry for a number of frames in this process and measure it.
+
+    Times are in milliseconds. The first frame, where most entries do their setup,
+    is not counted in the frame time statistics but reported separately.
+    """
+    result = {"entry": str(entry), "frames": 0, "error": ""}
+
+    missing = entry.get_missing_dependencies()
+    if missing:
+        result["error"] = "Missing dependencies: " + ", ".join(missing)
+        return result
+    if entry.min_python_version > sys.version_info:
+        result["error"] = "Python version too old"
+        return result
+
+    seed_everything(seed)
+    screen = pygame.display.get_surface() or pygame.display.set_mode(SIZE)
+    frame_times = []
+
+    try:
+        start = time.perf_counter()
+        mainloop = entry.get_mainloop()
+        result["import_time"] = (time.perf_counter() - start) * 1000
+
+        start = time.perf_counter()
+        next(mainloop)
+        mainloop.send((screen, events(0)))
+        result["first_frame_time"] = (time.perf_counter() - start) * 1000
+
+        for frame in range(1, frames):
+            frame_events = events(frame)
+            start = time.perf_counter()
+            mainloop.send((screen, frame_events))
+            frame_times.append((time.perf_counter() - start) * 1000)
+    except StopIteration:
+        pass
+    except Exception as e:
+        traceback.print_exc()
+        result["error"] = f"{type(e).__name__}: {e}"
+
+    frame_times.sort()
+    result["frames"] = len(frame_times)
+    if frame_times:
+        result["mean"] = sum(frame_times) / len(frame_times)
+        result["max"] = frame_times[-1]
+        for p in (50, 95, 99):
+            result[f"p{p}"] = percentile(frame_times, p)
+    result["peak_rss_mb"] = peak_rss_mb()
+
+    return result
+
+
+def benchmark_in_subprocess(
+    entry: Entry,
+    frames: int = 600,
+    capped: bool = False,
+    replay: Optional[Path] = None,
+    fixed_step: Optional[float] = None,
+    timeout: float = 600,
+) -> Dict:
+    """Run benchmark_entry in a new process, with a dummy display."""
+    env = dict(os.environ, SDL_VIDEODRIVER="dummy", SDL_AUDIODRIVER="dummy")
+    command = [sys.executable, "-m", "wclib.benchmark", "--child", "--frames", str(frames)]
+    if capped:
+        command.append("--capped")
+    if replay:
+        command += ["--replay", str(Path(replay).absolute())]
+    if fixed_step:
+        command += ["--fixed-step", str(fixed_step)]
+    command.append(str(entry))
+
+    try:
+        process = subprocess.run(
+            command,
+            cwd=ROOT_DIR,
+            env=env,
+            stdout=subprocess.PIPE,
+            universal_newlines=True,
+            timeout=timeout,
+        )
+    except subprocess.TimeoutExpired:
+        return {"entry": str(entry), "frames": 0, "error": f"Timeout after {timeout}s"}
+
+    for line in reversed(process.stdout.splitlines()):
+        if line.startswith(RESULT_MARKER):
+            return json.loads(line[len(RESULT_MARKER) :])
+
+    return {"entry": str(entry), "frames": 0, "error": f"Exit code {process.returncode}"}
+
+
+def write_report(results: List[Dict], path: Path):
+    """Write the results as CSV if the path ends with .csv, or as JSON otherwise."""
+    path = Path(path)
+    if path.suffix == ".csv":
+        with open(path, "w", newline="") as f:
+            writer = csv.DictWriter(f, REPORT_FIELDS, extrasaction="ignore")
+            writer.writeheader()
+            writer.writerows(results)
+    else:
+        path.write_text(json.dumps(results, indent=2))
+
+
+def find_entries(names: List[str]) -> List[Entry]:
+    """Get the entries corresponding to challenge names or challenge/entry names."""
+    if not names:
+        names = get_challenges()
+
+    entries = []
+    for name in names:
+        if "/" in name:
+            challenge, entry = name.split("/", 1)
+            entries.append(Entry(challenge, entry))
+        else:
+            entries.extend(sorted(get_entries(name), key=str))
+    return entries
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[1])
+    parser.add_argument("entries", nargs="*", help="challenge or challenge/entry to run")
+    parser.add_argument("-f", "--frames", type=int, default=600, help="frames per entry")
+    parser.add_argument("-o", "--output", default="benchmark.json", help="JSON or CSV report")
+    parser.add_argument(
+        "--capped", action="store_true", help="let the entries cap their framerate"
+    )
+    parser.add_argument("-r", "--replay", help="recording whose events are sent to the entries")
+    parser.add_argument(
+        "--fixed-step", type=float, help="milliseconds returned by every Clock.tick()"
+    )
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        if not args.capped:
+            uncap_framerate()
+        if args.fixed_step:
+            fix_time_step(args.fixed_step)
+
+        events = scripted_events
+        seed = 0
+        frames = args.frames
+        if args.replay:
+            player = EventPlayer(args.replay)
+            player.start()
+            events = lambda frame: player.next_events()
+            seed = player.seed
+            frames = min(frames, len(player))
+
+        pygame.init()
+        result = benchmark_entry(find_entries(args.entries)[0], frames, events, seed)
+        print(RESULT_MARKER + json.dumps(result))
+        return
+
+    results = []
+    for entry in find_entries(args.entries):
+        print(f"Running {entry}...", end=" ", flush=True)
+        result = benchmark_in_subprocess(
+            entry, args.frames, args.capped, args.replay, args.fixed_step
+        )
+        results.append(result)
+        if result["error"]:
+            print(result["error"])
+        elif "p50" not in result:
+            print("no frames measured")
+        else:
+            print(f"p50={result['p50']:.2f}ms p95={result['p95']:.2f}ms p99={result['p99']:.2f}ms")
+
+    # The most expensive entries first.
+    results.sort(key=lambda r: -r.get("p95", -math.inf))
+    write_report(results, Path(args.output))
+    print("Report written to", args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -3,6 +3,7 @@ from pathlib import Path
 SIZE = (1024, 768)
 ROOT_DIR = Path(__file__).parent.parent
 ASSETS = ROOT_DIR / "wclib" / "assets"
+CACHE_DIR = ROOT_DIR / ".cache"
 
 TITLE_FONT = "title"
 
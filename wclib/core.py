@@ -1,5 +1,8 @@
+import ast
+import atexit
 import importlib
 import json
+import os
 import subprocess
 import sys
 from collections import namedtuple
@@ -10,7 +13,8 @@ from typing import Generator, List, Tuple, Iterator, Type, Optional
 
 import pygame
 
-from .constants import SIZE, ROOT_DIR
+from .constants import SIZE, ROOT_DIR, CACHE_DIR
+from .replay import EventPlayer, EventRecorder
 
 MainLoop = Generator[None, Tuple[pygame.Surface, List[pygame.event.Event]], None]
 
@@ -22,6 +26,8 @@ __all__ = [
     "get_entries",
     "ChallengeData",
     "get_challenge_data",
+    "MetadataIndex",
+    "get_metadata_index",
 ]
 
 a = ["Casual", "Ambitious", "Adventurous"]
@@ -38,20 +44,17 @@ class Entry:
     dependencies: List[str]
 
     def __init__(self, challenge: str, entry: str):
-        """Load the metadata of an entry from the disk."""
-        name = f"{challenge}.{entry}.metadata"
-        module = importlib.import_module(name, f"{challenge}.{entry}")
-        # noinspection PyUnresolvedReferences
-        data: Entry = module.Metadata
+        """Load the metadata of an entry from the metadata index."""
+        data = get_metadata_index().get(challenge, entry)
 
         self.challenge = challenge
         self.entry = entry
 
-        self.discord_tag = data.discord_tag
-        self.display_name = data.display_name
-        self.achievements = data.achievements
-        self.min_python_version = data.min_python_version
-        self.dependencies = data.dependencies
+        self.discord_tag = data["discord_tag"]
+        self.display_name = data["display_name"]
+        self.achievements = data["achievements"]
+        self.min_python_version = tuple(data["min_python_version"])
+        self.dependencies = data["dependencies"]
 
     def __str__(self):
         return f"{self.challenge}/{self.entry}"
@@ -88,8 +91,29 @@ class Entry:
         return loop
 
 
-def run(mainloop: MainLoop, screen_size=SIZE):
-    """Minimal utility that runs a mainloop generator."""
+def run(mainloop: MainLoop, screen_size=SIZE, record=None, replay=None):
+    """
+    Minimal utility that runs a mainloop generator.
+
+    If [record] is a path, the events of each frame are saved there when the app exits.
+    If [replay] is a path to such a recording, its events are sent instead of the real ones,
+    and the app stops at the end of the recording.
+    Both can also be set with the WCLIB_RECORD and WCLIB_REPLAY environment variables.
+    """
+
+    record = record or os.environ.get("WCLIB_RECORD")
+    replay = replay or os.environ.get("WCLIB_REPLAY")
+    player = EventPlayer(replay) if replay else None
+    recorder = None
+    if record and player is not None:
+        # Recording a replay: the new recording must use the same seed to do the same thing.
+        recorder = EventRecorder(player.seed, player.fixed_step)
+    elif record:
+        recorder = EventRecorder()
+    if player is not None:
+        player.start()
+    elif recorder is not None:
+        recorder.start()
 
     screen = pygame.display.set_mode(screen_size)
     start = time()
@@ -98,14 +122,25 @@ def run(mainloop: MainLoop, screen_size=SIZE):
     while True:
         frames += 1
         events = pygame.event.get()
+        if player is not None:
+            if player.finished or any(e.type == pygame.QUIT for e in events):
+                break
+            events = player.next_events()
+        if recorder is not None:
+            recorder.record(events)
         try:
             mainloop.send((screen, events))
         except StopIteration:
             break
         pygame.display.flip()
 
+    if player is not None:
+        player.stop()
     end = time()
     print(f"App run for {end - start:02}s at {frames / (end - start)} FPS.")
+    if recorder is not None:
+        recorder.save(record)
+        print(f"Recorded {len(recorder)} frames in {record}.")
 
 
 def get_challenges():
@@ -117,14 +152,20 @@ def get_challenges():
     )
 
 
-def get_entries(challenge: str) -> Iterator[Entry]:
-    """Get all entries for a given challenge."""
+def get_entry_names(challenge: str) -> Iterator[str]:
+    """Get the names of all entries for a given challenge, without loading them."""
     challenge_dir = ROOT_DIR / challenge
     for directory in challenge_dir.iterdir():
         if not ((directory / "main.py").exists() and (directory / "metadata.py").exists()):
             continue
 
-        yield Entry(challenge, directory.stem)
+        yield directory.stem
+
+
+def get_entries(challenge: str) -> Iterator[Entry]:
+    """Get all entries for a given challenge."""
+    for entry in get_entry_names(challenge):
+        yield Entry(challenge, entry)
 
 
 ChallengeData = namedtuple("ChallengeData", "name entries_nb")
@@ -135,4 +176,88 @@ def get_challenge_data(challenge: str) -> ChallengeData:
     data: dict = json.loads((ROOT_DIR / challenge / "data.json").read_text())
     name = data.get("name", "No name")
 
-    return ChallengeData(name, sum(1 for _ in get_entries(challenge)))
+    return ChallengeData(name, sum(1 for _ in get_entry_names(challenge)))
+
+
+class MetadataIndex:
+    """
+    Cache of the metadata of all entries.
+
+    Importing every metadata.py is slow, and may crash. Instead, they are parsed
+    without being run, and the metadata is kept in a JSON file,
+    which is updated only for the metadata.py that changed since.
+    """
+
+    FIELDS = ["discord_tag", "display_name", "achievements", "min_python_version", "dependencies"]
+
+    def __init__(self, path=CACHE_DIR / "metadata.json"):
+        self.path = path
+        self.changed = False
+        try:
+            self.index = json.loads(self.path.read_text())
+        except (OSError, ValueError):
+            self.index = {}
+
+    def get(self, challenge: str, entry: str) -> dict:
+        """Return the metadata of an entry as a dict, from the index if it is up to date."""
+        path = ROOT_DIR / challenge / entry / "metadata.py"
+        mtime = path.stat().st_mtime
+        key = f"{challenge}/{entry}"
+
+        cached = self.index.get(key)
+        if cached is None or cached["mtime"] != mtime:
+            cached = {"mtime": mtime, "metadata": self.parse(challenge, entry)}
+            self.index[key] = cached
+            self.changed = True
+
+        return cached["metadata"]
+
+    def parse(self, challenge: str, entry: str) -> dict:
+        """Read the metadata of an entry, without running its metadata.py if possible."""
+        path = ROOT_DIR / challenge / entry / "metadata.py"
+        tree = ast.parse(path.read_text(encoding="utf-8"), str(path))
+
+        data = {}
+        for node in tree.body:
+            if isinstance(node, ast.ClassDef) and node.name == "Metadata":
+                for statement in node.body:
+                    if isinstance(statement, ast.Assign):
+                        targets = statement.targets
+                    elif isinstance(statement, ast.AnnAssign) and statement.value:
+                        targets = [statement.target]
+                    else:
+                        continue
+                    for target in targets:
+                        if isinstance(target, ast.Name) and target.id in self.FIELDS:
+                            try:
+                                data[target.id] = ast.literal_eval(statement.value)
+                            except ValueError:
+                                pass
+
+        if set(data) != set(self.FIELDS):
+            # Something that is not a plain value, we need to run the file.
+            name = f"{challenge}.{entry}.metadata"
+            module = importlib.import_module(name, f"{challenge}.{entry}")
+            data = {field: getattr(module.Metadata, field) for field in self.FIELDS}
+
+        data["min_python_version"] = list(data["min_python_version"])
+        return data
+
+    def save(self):
+        """Write the index to the disk, if it changed."""
+        if not self.changed:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # Other processes may read it at the same time, so it is replaced in one go.
+        temp = self.path.with_name(f"{self.path.name}.{os.getpid()}.tmp")
+        temp.write_text(json.dumps(self.index, indent=1))
+        os.replace(temp, self.path)
+        self.changed = False
+
+
+@lru_cache()
+def get_metadata_index() -> MetadataIndex:
+    """The index used by all the entries, loaded the first time and saved at exit."""
+    index = MetadataIndex()
+    atexit.register(index.save)
+    return index
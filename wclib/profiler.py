@@ -0,0 +1,200 @@
+"""
+Frame time profiler for the showcase.
+
+The profiler records how long each phase of each frame takes (events, logic, draw...),
+as well as each call to the mainloop of the embedded apps.
+The last frames are kept in memory, and can be shown on top of the showcase
+or saved in the Chrome trace format, which can be opened
+in chrome://tracing, https://ui.perfetto.dev or https://www.speedscope.app.
+
+Controls, in the showcase:
+ - [F3] Toggles the profiler overlay
+ - [F4] Saves the last frames in traces/
+"""
+
+import json
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import pygame
+
+from .constants import ROOT_DIR, LIGHT, GREY
+from .utils import text
+
+__all__ = ["Profiler", "profiler"]
+
+
+class Frame:
+    """All the time measurements of a frame."""
+
+    __slots__ = ("start", "end", "phases", "calls")
+
+    def __init__(self, start):
+        self.start = start
+        self.end = start
+        # (name, start, duration) of the main parts of the frame. They don't overlap.
+        self.phases: List[Tuple[str, float, float]] = []
+        # (name, start, duration) of the other measured things, inside the phases.
+        self.calls: List[Tuple[str, float, float]] = []
+
+    @property
+    def duration(self):
+        return self.end - self.start
+
+
+class Profiler:
+    PHASE_COLORS = {
+        "events": "#F6EDD4",
+        "logic": "#48929B",
+        "draw": "#9B59B6",
+        "wait": "#303030",
+    }
+    GRAPH_SIZE = (300, 100)
+    GRAPH_SCALE = 100 / (2 * 1000 / 60)  # pixels per ms, two frames at 60 FPS fill the graph.
+
+    def __init__(self, history=300, top=5):
+        """
+        Args:
+            history: number of frames that are kept.
+            top: number of slow calls that are shown in the overlay.
+        """
+        self.frames: deque = deque(maxlen=history)
+        self.top = top
+        self.current = None
+        self.visible = False
+        self.traces_dir = ROOT_DIR / "traces"
+
+    def start_frame(self):
+        self.current = Frame(time.perf_counter())
+
+    def end_frame(self):
+        if self.current is None:
+            return
+        self.current.end = time.perf_counter()
+        self.frames.append(self.current)
+        self.current = None
+
+    @contextmanager
+    def phase(self, name):
+        """Measure one of the main parts of the frame."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            if self.current is not None:
+                self.current.phases.append((name, start, time.perf_counter() - start))
+
+    @contextmanager
+    def measure(self, name):
+        """Measure any part of the frame, for instance the logic of a widget."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            if self.current is not None:
+                self.current.calls.append((name, start, time.perf_counter() - start))
+
+    def handle_event(self, event) -> bool:
+        if event.type == pygame.KEYDOWN:
+            if event.key == pygame.K_F3:
+                self.visible = not self.visible
+                return True
+            elif event.key == pygame.K_F4:
+                path = self.traces_dir / time.strftime("trace-%Y%m%d-%H%M%S.json")
+                self.dump_chrome_trace(path)
+                print(f"Saved the last {len(self.frames)} frames in {path}.")
+                return True
+        return False
+
+    def slowest(self, n=None) -> List[Tuple[str, float]]:
+        """The names of the slowest calls, and their average time per frame in ms."""
+        totals: Dict[str, float] = defaultdict(float)
+        for frame in self.frames:
+            for name, start, duration in frame.calls:
+                totals[name] += duration
+
+        frames = max(1, len(self.frames))
+        averages = [(name, total / frames * 1000) for name, total in totals.items()]
+        averages.sort(key=lambda x: -x[1])
+        return averages[: n or self.top]
+
+    def draw(self, screen: pygame.Surface) -> Optional[pygame.Rect]:
+        """Draw the overlay, and return the part of the screen it covers."""
+        if not self.visible:
+            return None
+
+        # Legend and slowest calls, above the graph.
+        lines = [(name, color) for name, color in self.PHASE_COLORS.items()]
+        if self.frames:
+            last = self.frames[-1]
+            lines.insert(0, (f"Frame: {last.duration * 1000:.2f}ms", LIGHT))
+        lines += [(f"{ms:6.2f}ms  {name}", LIGHT) for name, ms in self.slowest()]
+        lines = [text(line, color, 16) for line, color in lines]
+
+        w, h = self.GRAPH_SIZE
+        graph = pygame.Rect(10, screen.get_height() - h - 10, w, h)
+        lines_height = sum(t.get_height() for t in lines)
+        area = pygame.Rect(0, graph.top - lines_height - 10, w + 20, lines_height + h + 20)
+        overlay = pygame.Surface(area.size, pygame.SRCALPHA)
+        overlay.fill((0, 0, 0, 180))
+        screen.blit(overlay, area)
+
+        y = area.top + 5
+        for t in lines:
+            y = screen.blit(t, (graph.left, y)).bottom
+
+        # One vertical bar per frame, with a color for each phase.
+        bar_width = w / self.frames.maxlen
+        for i, frame in enumerate(self.frames):
+            x = graph.left + i * bar_width
+            y = graph.bottom
+            for name, start, duration in frame.phases:
+                # Slow frames are cut at the top of the graph.
+                height = min(duration * 1000 * self.GRAPH_SCALE, y - graph.top)
+                color = self.PHASE_COLORS.get(name, GREY)
+                screen.fill(color, (x, y - height, max(1, bar_width), height))
+                y -= height
+
+        # The 60 FPS line.
+        y = graph.bottom - 1000 / 60 * self.GRAPH_SCALE
+        pygame.draw.line(screen, "red", (graph.left, y), (graph.right, y))
+
+        return area
+
+    def chrome_trace(self) -> dict:
+        """The recorded frames in the Chrome trace event format."""
+        events = []
+        if not self.frames:
+            return {"traceEvents": events}
+
+        origin = self.frames[0].start
+
+        def event(name, start, duration, category):
+            return {
+                "name": name,
+                "cat": category,
+                "ph": "X",
+                "ts": (start - origin) * 1e6,
+                "dur": duration * 1e6,
+                "pid": 0,
+                "tid": 0,
+            }
+
+        for frame in self.frames:
+            events.append(event("frame", frame.start, frame.duration, "frame"))
+            events.extend(event(*phase, "phase") for phase in frame.phases)
+            events.extend(event(*call, "call") for call in frame.calls)
+
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def dump_chrome_trace(self, path):
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(self.chrome_trace()))
+
+
+# The profiler of the showcase.
+profiler = Profiler()
@@ -0,0 +1,175 @@
+"""
+Recording and replaying the events sent to a mainloop.
+
+A recording contains the list of events of every frame, as the mainloop received them,
+and the seed given to the random module when the recording started.
+Replaying it sends the exact same events, frame by frame, after seeding
+random with the same seed, so that two runs of an entry do the same thing.
+
+Recordings are JSON files, so they can be shared or kept next to benchmark reports.
+"""
+
+import json
+import random
+import sys
+from pathlib import Path
+from typing import Iterable, List, Optional
+
+import pygame
+
+__all__ = [
+    "EventRecorder",
+    "EventPlayer",
+    "FixedStepClock",
+    "fix_time_step",
+    "patch_clock",
+    "restore_clock",
+    "seed_everything",
+]
+
+
+def seed_everything(seed: int):
+    """Seed random, and numpy.random if numpy is used."""
+    random.seed(seed)
+    numpy = sys.modules.get("numpy")
+    if numpy is not None:
+        numpy.random.seed(seed % 2 ** 32)
+
+
+def serialize_event(event: pygame.event.Event) -> dict:
+    """Convert an event to a dict that can be saved as JSON."""
+    data = {}
+    for key, value in event.__dict__.items():
+        if isinstance(value, (tuple, list, pygame.Vector2)):
+            value = list(value)
+        elif not isinstance(value, (int, float, str, bool, type(None))):
+            # Some events have attributes that can't be saved, like the window.
+            continue
+        data[key] = value
+    return {"type": event.type, "attrs": data}
+
+
+def deserialize_event(data: dict) -> pygame.event.Event:
+    attrs = {k: tuple(v) if isinstance(v, list) else v for k, v in data["attrs"].items()}
+    return pygame.event.Event(data["type"], **attrs)
+
+
+class EventRecorder:
+    """Record the events of each frame, to save them to a file."""
+
+    def __init__(self, seed: Optional[int] = None, fixed_step: Optional[float] = None):
+        """
+        Args:
+            seed: the seed given to random. A random one is picked if None.
+            fixed_step: the time step in milliseconds to use when replaying, if any.
+        """
+        self.seed = random.randrange(2 ** 32) if seed is None else seed
+        self.fixed_step = fixed_step
+        self.frames: List[List[dict]] = []
+
+    def __len__(self):
+        return len(self.frames)
+
+    def start(self):
+        """Seed the random generators. Call it before the mainloop is started."""
+        seed_everything(self.seed)
+
+    def record(self, events: Iterable[pygame.event.Event]):
+        """Record the events of one frame."""
+        self.frames.append([serialize_event(e) for e in events])
+
+    def save(self, path):
+        data = {
+            "pygame": pygame.version.ver,
+            "seed": self.seed,
+            "fixed_step": self.fixed_step,
+            "frames": self.frames,
+        }
+        Path(path).write_text(json.dumps(data))
+
+
+class EventPlayer:
+    """Send back the events of a recording, one frame at a time."""
+
+    def __init__(self, path):
+        data = json.loads(Path(path).read_text())
+        if data.get("pygame") != pygame.version.ver:
+            # Events types are not guaranteed to be the same between versions.
+            print(f"Warning: {path} was recorded with pygame {data.get('pygame')}", file=sys.stderr)
+
+        self.seed: int = data["seed"]
+        self.fixed_step: Optional[float] = data.get("fixed_step")
+        self.frames = [[deserialize_event(e) for e in frame] for frame in data["frames"]]
+        self.frame = 0
+
+    def __len__(self):
+        return len(self.frames)
+
+    @property
+    def finished(self):
+        return self.frame >= len(self.frames)
+
+    def start(self):
+        """Seed the random generators and fix the time step, if it was recorded with one.
+        Call it before the mainloop is started."""
+        seed_everything(self.seed)
+        if self.fixed_step:
+            fix_time_step(self.fixed_step)
+
+    def stop(self):
+        """Put back the real pygame Clock if start() replaced it.
+        Call it when the replay is over."""
+        if self.fixed_step:
+            restore_clock()
+
+    def next_events(self) -> List[pygame.event.Event]:
+        """Return the events of the next frame, or no events if the recording is finished."""
+        if self.finished:
+            return []
+        self.frame += 1
+        return self.frames[self.frame - 1]
+
+
+class FixedStepClock:
+    """
+    A replacement for pygame.time.Clock whose tick() never waits
+    and always returns the same time step.
+
+    Entries that move things according to the time returned by tick()
+    then do exactly the same thing on each run, whatever the speed of the computer.
+    """
+
+    step = 1000 / 60
+
+    def __init__(self):
+        self._clock = pygame.time._Clock()
+
+    def tick(self, framerate=0):
+        self._clock.tick()
+        return self.step
+
+    def tick_busy_loop(self, framerate=0):
+        return self.tick()
+
+    def __getattr__(self, item):
+        return getattr(self._clock, item)
+
+
+def patch_clock(clock_class):
+    """Make every pygame.time.Clock created from now on an instance of clock_class."""
+    if not hasattr(pygame.time, "_Clock"):
+        pygame.time._Clock = pygame.time.Clock
+    pygame.time.Clock = clock_class
+
+
+def restore_clock():
+    """Undo patch_clock(): the Clocks created from now on are real pygame Clocks again."""
+    if hasattr(pygame.time, "_Clock"):
+        pygame.time.Clock = pygame.time._Clock
+
+
+def fix_time_step(step: float = 1000 / 60):
+    """Make every Clock created from now on return [step] milliseconds
+    on each tick, without waiting."""
+    FixedStepClock.step = step
+    patch_clock(FixedStepClock)
@@ -7,18 +7,20 @@ as well as the state machine (App) that orchestrate between them.
 from operator import attrgetter
 from functools import partial
 from random import shuffle
-from typing import Callable
+from typing import Callable, List
 
 import pygame
 
 from .constants import *
 from .core import *
+from .profiler import profiler
 from .utils import text, load_image
 from .widgets import *
 
 
 class State:
     BG_COLOR = BACKGROUND
+    FPS = None  # The state is not limited by the app if None.
 
     def __init__(self, app: "App", *widgets: Widget):
         self.app = app
@@ -30,10 +32,10 @@ class State:
 
     def handle_event(self, event):
         if event.type == pygame.QUIT:
-            return self.app.states.clear() or True
+            return self.app.quit() or True
         elif event.type == pygame.KEYDOWN:
             if event.key == pygame.K_ESCAPE:
-                self.app.states.pop()
+                self.app.pop_state()
                 return True
 
         for widget in self.widgets:
@@ -51,6 +53,20 @@ class State:
         for widget in self.widgets:
             widget.draw(screen)
 
+    def dirty_rects(self) -> List[pygame.Rect]:
+        """The regions of the screen that changed since the last draw."""
+        return [rect for widget in self.widgets for rect in widget.dirty_rects()]
+
+    def clean(self):
+        """Called once the changes have been drawn on the display."""
+        for widget in self.widgets:
+            widget.clean()
+
+    def close(self):
+        """Called when the state is removed, to stop the apps it runs."""
+        for widget in self.widgets:
+            widget.close()
+
 
 class App:
     """
@@ -67,6 +83,7 @@ class App:
         self.states = [initial_state(self)]
 
         pygame.display.set_caption(self.TITLE)
+        self.clock = pygame.time.Clock()
 
     @property
     def state(self):
@@ -74,16 +91,80 @@ class App:
             return self.states[-1]
         return State(self)  # dummy, to finish the frame withou error
 
+    def pop_state(self):
+        """Remove the current state."""
+        self.states.pop().close()
+
+    def quit(self):
+        """Remove all the states, which stops the app."""
+        while self.states:
+            self.pop_state()
+
     def run(self):
+        try:
+            self._run()
+        finally:
+            # Otherwise the processes of the entries would keep running.
+            self.quit()
+
+    def _run(self):
+        drawn_state = None
+        # Part of the screen covered by the profiler in the last frame.
+        overlay = None
         while self.states:
-            for event in pygame.event.get():
-                self.state.handle_event(event)
-            self.state.logic()
-            self.state.draw(self.screen)
-            pygame.display.update()
+            profiler.start_frame()
+
+            with profiler.phase("events"):
+                for event in pygame.event.get():
+                    if not profiler.handle_event(event):
+                        self.state.handle_event(event)
+
+            with profiler.phase("logic"):
+                self.state.logic()
+
+            with profiler.phase("draw"):
+                overlay = self.draw(drawn_state, overlay)
+                drawn_state = self.state
+
+            fps = self.state.FPS
+            if fps:
+                with profiler.phase("wait"):
+                    self.clock.tick(fps)
+
+            profiler.end_frame()
+
+    def draw(self, drawn_state, overlay):
+        """Draw the parts of the state that changed, and return the part covered by the profiler."""
+        state = self.state
+        if state is not drawn_state:
+            # Another state is shown, everything changed.
+            dirty = [self.screen.get_rect()]
+        else:
+            dirty = state.dirty_rects()
+            # The profiler must be erased where it was drawn last frame.
+            if overlay is not None:
+                dirty.append(overlay)
+
+        if not dirty and not profiler.visible:
+            # Nothing changed, no need to draw anything.
+            return None
+
+        if dirty:
+            # Only the dirty part of the screen is redrawn and sent to the display.
+            self.screen.set_clip(dirty[0].unionall(dirty[1:]))
+            state.draw(self.screen)
+            self.screen.set_clip(None)
+            state.clean()
+
+        overlay = profiler.draw(self.screen)
+        if overlay is not None:
+            dirty.append(overlay)
+        pygame.display.update(dirty)
+        return overlay
 
 
 class MenuState(State):
+    FPS = 60
     GAPS = 20  # pixels between each button
     ButtonClass = BigButton
 
@@ -102,13 +183,15 @@ class MenuState(State):
             for i, button in enumerate(buttons)
         ]
 
+        self.scheduler = ThumbnailScheduler()
+        for button in buttons:
+            button.scheduler = self.scheduler
+
         self.scroll_area = ScrollableWidget(
             (0, 0), SIZE, title, *buttons, top=ACCENT, bottom=self.BG_COLOR
         )
         super().__init__(app, self.scroll_area)
 
-        self.clock = pygame.time.Clock()
-
     def button_position(self, i):
         gaps = self.GAPS
         cols = SIZE[0] // (BigButton.TOTAL_SIZE[0] + gaps)
@@ -125,11 +208,10 @@ class MenuState(State):
     def logic(self):
         super().logic()
         self.timer += 1
-        self.clock.tick(60)
 
-        # we load one app per frame, for smoother UX
-        # This just loads the first unloaded app
-        any(b.app.load() for b in self.scroll_area if isinstance(b, BigButton))
+        # The visible buttons submitted the apps they want to load or update,
+        # and we run as many as fit in the frame, for smoother UX.
+        self.scheduler.run()
 
     def draw(self, screen: pygame.Surface):
         super().draw(screen)
@@ -182,9 +264,12 @@ class EntrySelectState(MenuState):
             shuffle(buttons)
 
         button.surf.set_alpha(100)
+        button.dirty = True
 
         for i, button in enumerate(buttons):
             button.move_to(self.button_position(i))
+        # The buttons moved, their previous positions need to be redrawn too.
+        self.scroll_area.dirty = True
 
     def button_click(self, entry):
         self.app.states.append(EntryViewState(self.app, entry))
@@ -200,6 +285,8 @@ class EntrySelectState(MenuState):
 
 
 class EntryViewState(State):
+    RECORDINGS_DIR = ROOT_DIR / "recordings"
+
     def __init__(self, app: "App", entry: Entry):
         super().__init__(app)
 
@@ -207,14 +294,49 @@ class EntryViewState(State):
 
         self.embedded_app = EmbeddedApp(entry)
 
+    @property
+    def recording_path(self):
+        return self.RECORDINGS_DIR / f"{self.entry.challenge}-{self.entry.entry}.json"
+
     def handle_event(self, event):
+        if event.type == pygame.KEYDOWN and event.key == pygame.K_F9:
+            # Toggle the recording of the events.
+            if self.embedded_app.recorder is not None:
+                self.RECORDINGS_DIR.mkdir(exist_ok=True)
+                self.embedded_app.stop_recording(self.recording_path)
+            else:
+                self.embedded_app.start_recording()
+            return
+        elif event.type == pygame.KEYDOWN and event.key == pygame.K_F10:
+            # Replay the last recording.
+            if self.recording_path.exists():
+                self.embedded_app.start_replay(self.recording_path)
+            return
+
         super().handle_event(event)
         self.embedded_app.handle_event(event)
 
     def logic(self):
         self.embedded_app.logic()
         if self.embedded_app.exited:
-            self.app.states.pop()
+            self.app.pop_state()
+
+    def close(self):
+        super().close()
+        self.embedded_app.close()
+
+    def dirty_rects(self):
+        return self.embedded_app.dirty_rects()
+
+    def clean(self):
+        self.embedded_app.clean()
 
     def draw(self, screen):
         self.embedded_app.draw(screen)
+
+        if self.embedded_app.recorder is not None:
+            t = text("REC", "red")
+            screen.blit(t, t.get_rect(topright=(SIZE[0] - 10, 10)))
+        elif self.embedded_app.player is not None:
+            t = text("REPLAY", ACCENT)
+            screen.blit(t, t.get_rect(topright=(SIZE[0] - 10, 10)))
@@ -0,0 +1,82 @@
+"""
+On-disk cache of the thumbnails shown in the menus.
+
+Showing the first frame of an entry means importing it and running its setup,
+which can take a while. Instead, the first frame is saved as a PNG
+the first time, and loaded from there the next times.
+The name of the file contains a hash of the names, sizes and modification
+times of the files of the entry and of the assets of its challenge,
+so that a new thumbnail is made whenever the entry changes.
+"""
+
+import hashlib
+from typing import Optional, Tuple
+
+import pygame
+
+from .constants import CACHE_DIR, ROOT_DIR
+from .core import Entry
+
+__all__ = ["ThumbnailCache", "thumbnail_cache"]
+
+
+def entry_hash(entry: Entry) -> str:
+    """
+    Hash of the files of an entry and of the assets shared by its challenge.
+
+    Only the name, size and modification time of the files are hashed, as
+    reading all of them, images and sounds included, would be too slow.
+    """
+    challenge = ROOT_DIR / entry.challenge
+    digest = hashlib.sha1()
+    for directory in (challenge / entry.entry, challenge / "assets"):
+        for path in sorted(directory.rglob("*")):
+            if not path.is_file() or "__pycache__" in path.parts:
+                continue
+            stat = path.stat()
+            name = path.relative_to(challenge).as_posix()
+            digest.update(f"{name}:{stat.st_size}:{stat.st_mtime_ns}\n".encode())
+    return digest.hexdigest()[:16]
+
+
+class ThumbnailCache:
+    def __init__(self, directory=CACHE_DIR / "thumbnails"):
+        self.directory = directory
+        # Hashing the files is not free, and they don't change while the showcase runs.
+        self._hashes = {}
+
+    def path(self, entry: Entry, size: Tuple[int, int]):
+        key = str(entry)
+        if key not in self._hashes:
+            self._hashes[key] = entry_hash(entry)
+        name = f"{entry.challenge}-{entry.entry}-{size[0]}x{size[1]}-{self._hashes[key]}.png"
+        return self.directory / name
+
+    def load(self, entry: Entry, size: Tuple[int, int]) -> Optional[pygame.Surface]:
+        """Return the cached thumbnail of the entry, or None if it is not cached."""
+        path = self.path(entry, size)
+        if not path.exists():
+            return None
+
+        try:
+            return pygame.image.load(str(path)).convert()
+        except pygame.error:
+            # Most likely a file that was not completely written.
+            return None
+
+    def save(self, entry: Entry, thumbnail: pygame.Surface):
+        """Save the thumbnail of the entry, and remove its outdated thumbnails."""
+        size = thumbnail.get_size()
+        path = self.path(entry, size)
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+        pattern = f"{entry.challenge}-{entry.entry}-{size[0]}x{size[1]}-*.png"
+        for old in self.directory.glob(pattern):
+            if old != path:
+                old.unlink()
+
+        pygame.image.save(thumbnail, str(path))
+
+
+# The cache used by the showcase.
+thumbnail_cache = ThumbnailCache()
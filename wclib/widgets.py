@@ -1,9 +1,10 @@
+import os
 import sys
 import time
 import traceback
 from itertools import accumulate
 from threading import Thread
-from typing import Optional, Callable
+from typing import Optional, Callable, Dict, List, Tuple
 
 import pygame
 import pygame.gfxdraw
@@ -11,6 +12,10 @@ import pygame.gfxdraw
 from wclib.core import *
 from wclib.utils import *
 from wclib.constants import *
+from wclib.profiler import profiler
+from wclib.replay import EventPlayer, EventRecorder
+from wclib.thumbnails import thumbnail_cache
+from wclib.worker import EntryWorker, WorkerExited, workers_available
 
 __all__ = [
     "ImageWidget",
@@ -22,6 +27,7 @@ __all__ = [
     "ScrollableWidget",
     "IconButton",
     "EmbeddedApp",
+    "ThumbnailScheduler",
 ]
 
 
@@ -33,11 +39,23 @@ class Widget:
         self.size = pygame.Vector2(size)
 
         self.mouse_over = None
+        # Whether the widget changed and needs to be drawn again.
+        self.dirty = True
 
     @property
     def rect(self):
         return pygame.Rect(self.position, self.size)
 
+    def dirty_rects(self) -> List[pygame.Rect]:
+        """The regions that changed since the last draw, relative to the parent."""
+        if self.dirty:
+            return [self.rect]
+        return []
+
+    def clean(self):
+        """Called once the widget has been drawn on the display."""
+        self.dirty = False
+
     def handle_event(self, event: pygame.event.Event) -> bool:
         if event.type == pygame.MOUSEMOTION:
             self.mouse_over = self.rect.collidepoint(self.position)
@@ -45,6 +63,14 @@ class Widget:
     def logic(self):
         pass
 
+    def hidden(self):
+        """Called when the widget is scrolled out of the screen."""
+        pass
+
+    def close(self):
+        """Called when the widget is not used anymore, to free what it holds."""
+        pass
+
     def draw(self, screen):
         pass
 
@@ -59,6 +85,20 @@ class Container(Widget):
     def __iter__(self):
         return iter(self.widgets)
 
+    def dirty_rects(self) -> List[pygame.Rect]:
+        if self.dirty:
+            return [self.rect]
+        return [r.move(self.position) for widget in self for r in widget.dirty_rects()]
+
+    def clean(self):
+        super().clean()
+        for widget in self:
+            widget.clean()
+
+    def close(self):
+        for widget in self:
+            widget.close()
+
     def logic(self):
         for widget in self:
             widget.logic()
@@ -134,15 +174,41 @@ class BigButton(Widget):
         self.mouse_over = False
 
         self.app = EmbeddedApp(self.entry, self.position, self.SIZE)
+        # If set, the scheduler decides when the app is loaded and updated.
+        self.scheduler: Optional[ThumbnailScheduler] = None
+        # Shown instead of the app until it is loaded, so that we load only
+        # the apps that are hovered, and not all of them. It is looked up
+        # in the cache only once the button is shown, see cached_thumbnail().
+        self.thumbnail: Optional[pygame.Surface] = None
+        self.thumbnail_looked_up = False
 
     def __repr__(self):
         return f"<{self.__class__.__name__}({self.entry})>"
 
+    def dirty_rects(self) -> List[pygame.Rect]:
+        if self.dirty or self.app.dirty:
+            return [self.rect]
+        return []
+
+    def clean(self):
+        super().clean()
+        self.app.clean()
+
+    def cached_thumbnail(self):
+        """Load the thumbnail from the cache, the first time the button is needed."""
+        if not self.thumbnail_looked_up:
+            self.thumbnail_looked_up = True
+            self.thumbnail = thumbnail_cache.load(self.entry, self.SIZE)
+
     def draw(self, screen):
+        self.cached_thumbnail()
         background = "#222728" if self.mouse_over else "#212121"
         pygame.draw.rect(screen, background, self.rect, border_radius=4)
 
-        self.app.draw(screen)
+        if self.app.mainloop is None and self.thumbnail is not None:
+            screen.blit(self.thumbnail, self.app.rect)
+        else:
+            self.app.draw(screen)
 
         offset = pygame.Vector2(0, -self.NAME_HEIGHT / 2)
         t = text(self.title, ACCENT)
@@ -150,8 +216,38 @@ class BigButton(Widget):
 
     def logic(self):
         super().logic()
-        if self.mouse_over:
-            self.app.logic()
+        self.cached_thumbnail()
+        if self.scheduler is None:
+            if self.mouse_over:
+                self.app.logic()
+        elif self.mouse_over:
+            self.scheduler.submit(self.app, self.app.logic, priority=1)
+        elif self.thumbnail is None and (self.app.mainloop is None or self.app.starting):
+            self.scheduler.submit(self.app, self.load_thumbnail)
+
+    def load_thumbnail(self):
+        """Load the app to show its first frame, and cache it for the next times."""
+        if self.app.mainloop is None:
+            self.app.load()
+        else:
+            # The app runs in another process and its first frame was not ready yet.
+            self.app.mainloop_next()
+
+        if self.app.running_entry:
+            self.dirty = True
+            self.thumbnail = pygame.transform.smoothscale(self.app.frame, self.SIZE)
+            thumbnail_cache.save(self.entry, self.thumbnail)
+            # The thumbnail is all we needed, no need to keep another process running.
+            if self.app.in_process:
+                self.app.stop()
+
+    def hidden(self):
+        # Processes of apps that can't be seen are only wasting resources.
+        if self.app.in_process:
+            self.app.stop()
+
+    def close(self):
+        self.app.close()
 
     def handle_event(self, event):
         if event.type == pygame.MOUSEBUTTONDOWN and event.button == 1:
@@ -160,7 +256,10 @@ class BigButton(Widget):
                 return
 
         if event.type == pygame.MOUSEMOTION:
-            self.mouse_over = self.rect.collidepoint(event.pos)
+            mouse_over = self.rect.collidepoint(event.pos)
+            if mouse_over != self.mouse_over:
+                self.dirty = True
+            self.mouse_over = mouse_over
 
         if self.mouse_over:
             self.app.handle_event(event)
@@ -168,6 +267,7 @@ class BigButton(Widget):
     def move_to(self, new_pos):
         self.position = pygame.Vector2(new_pos)
         self.app.position = self.position
+        self.dirty = True
 
 
 class EntryButton(BigButton):
@@ -221,6 +321,10 @@ class ChallengeButton(BigButton):
 
 
 class EmbeddedApp(Widget):
+    # Whether entries run in their own process. This can be enabled by setting
+    # the WCLIB_PROCESSES environment variable to 1.
+    USE_PROCESSES = os.environ.get("WCLIB_PROCESSES") == "1"
+
     def __init__(self, entry: Entry, pos=(0, 0), size=SIZE):
         super().__init__(pos, size)
         self.entry = entry
@@ -234,9 +338,21 @@ class EmbeddedApp(Widget):
 
         self.mainloop = None
         self.exited = False
+        # Whether the mainloop is the entry's, and not a crash/install/exit screen.
+        self.running_entry = False
+        # Whether the entry is started in another process but didn't draw its first frame.
+        self.starting = False
+        # When the app runs in another process, the last frame it drew, in shared memory.
+        self.shared_frame: Optional[pygame.Surface] = None
+        # Whether the app runs in another process right now.
+        self.in_process = False
 
         self.events_storage = []
 
+        # To record the events sent to the app, or replay them.
+        self.recorder: Optional[EventRecorder] = None
+        self.player: Optional[EventPlayer] = None
+
     def load(self) -> bool:
         """Ensure the app is loaded. Return False if it was already loaded."""
         if self.mainloop is None:
@@ -245,8 +361,23 @@ class EmbeddedApp(Widget):
             return True
 
     def mainloop_next(self, events=(), _first=False):
+        with profiler.measure(str(self.entry)):
+            self._mainloop_next(events, _first)
+
+    def _mainloop_next(self, events=(), _first=False):
         # Erase the cache
         self.scaled_virtual_screen = None
+        self.dirty = True
+
+        if not _first:
+            if self.player is not None:
+                events = self.player.next_events()
+                if self.player.finished:
+                    # Back to the real events, and the real clock.
+                    self.player.stop()
+                    self.player = None
+            if self.recorder is not None:
+                self.recorder.record(events)
 
         try:
             if _first:
@@ -255,23 +386,72 @@ class EmbeddedApp(Widget):
         except StopIteration:
             # The app just quitted.
             self.mainloop = self.app_exited_mainloop()
+            self.running_entry = False
         except TypeError as e:
             # Yuck!
             if e.args == ("can't send non-None value to a just-started generator",):
-                return self.mainloop_next(events, True)
+                return self._mainloop_next(events, True)
             else:
                 self.mainloop = self.crashed_mainloop(e)
+                self.running_entry = False
         except Exception as e:  # Or BaseException ?
             self.mainloop = self.crashed_mainloop(e)
+            self.running_entry = False
+
+    def stop(self):
+        """Stop the app, and its process if it runs in one. It starts again when needed."""
+        if self.mainloop is not None:
+            # Stops the other process, if the app runs in one.
+            self.mainloop.close()
+        self.mainloop = None
+
+    def close(self):
+        self.stop()
+
+    def restart(self):
+        """Start the app again from its first frame."""
+        self.stop()
+        self.exited = False
+        if self.player is not None:
+            self.player.start()
+        elif self.recorder is not None:
+            self.recorder.start()
+
+    def start_recording(self):
+        """Restart the app and record all the events it receives."""
+        if self.player is not None:
+            self.player.stop()
+        self.player = None
+        self.recorder = EventRecorder()
+        self.restart()
+
+    def stop_recording(self, path):
+        """Save the recorded events to [path]."""
+        self.recorder.save(path)
+        print(f"Recorded {len(self.recorder)} frames of {self.entry} in {path}.")
+        self.recorder = None
+
+    def start_replay(self, path):
+        """Restart the app and send it the events from a recording instead of the real ones."""
+        self.recorder = None
+        if self.player is not None:
+            self.player.stop()
+        self.player = EventPlayer(path)
+        self.restart()
 
     def load_mainloop(self):
+        self.running_entry = False
         if self.entry.min_python_version > sys.version_info:
             loop = self.python_too_old_mainloop()
         elif self.entry.get_missing_dependencies():
             loop = self.install_mainloop()
         else:
             try:
-                loop = self.entry.get_mainloop()
+                if self.USE_PROCESSES and workers_available():
+                    loop = self.process_mainloop()
+                else:
+                    loop = self.entry.get_mainloop()
+                    self.running_entry = True
             except Exception as e:
                 loop = self.crashed_mainloop(e)
 
@@ -316,21 +496,63 @@ class EmbeddedApp(Widget):
             )
         return event
 
+    @property
+    def frame(self) -> pygame.Surface:
+        """The last frame drawn by the app."""
+        if self.shared_frame is not None:
+            return self.shared_frame
+        return self.virtual_screen
+
     def draw(self, screen: pygame.Surface):
         if not self.mainloop:
             return
 
-        if self.rect.size != self.virtual_screen.get_size():
+        if self.rect.size != self.frame.get_size():
             if self.scaled_virtual_screen is None:
                 self.scaled_virtual_screen = pygame.transform.smoothscale(
-                    self.virtual_screen, self.rect.size
+                    self.frame, self.rect.size
                 )
             screen.blit(self.scaled_virtual_screen, self.rect)
         else:
-            screen.blit(self.virtual_screen, self.rect)
+            screen.blit(self.frame, self.rect)
 
     # Different states of the widget.
 
+    def process_mainloop(self):
+        """Run the entry in another process and show its frames."""
+        self.starting = True
+        self.in_process = True
+        # When recording or replaying, the child uses the same seed and clock as the
+        # recording, and gets the events of each frame in the same frame, like without a process.
+        source = self.player if self.player is not None else self.recorder
+        if source is not None:
+            worker = EntryWorker(self.entry, seed=source.seed, fixed_step=source.fixed_step)
+        else:
+            worker = EntryWorker(self.entry)
+        try:
+            while True:
+                screen, events = yield
+                try:
+                    recording = self.player is not None or self.recorder is not None
+                    frame = worker.update(events, wait=recording)
+                except WorkerExited:
+                    return
+
+                if frame is not None:
+                    # The frame is shared with the other process, no need to copy it.
+                    self.shared_frame = frame
+                    self.running_entry = True
+                    self.starting = False
+        finally:
+            self.starting = False
+            self.in_process = False
+            # The shared memory is about to be freed, so we need our own copy of the frame,
+            # and to drop all the references to the shared one.
+            if self.shared_frame is not None:
+                self.virtual_screen.blit(self.shared_frame, (0, 0))
+            self.shared_frame = frame = None
+            worker.close()
+
     def install_mainloop(self):
         w, h = SIZE
         install_rect = pygame.Rect(0, 0, 600, 100)
@@ -462,6 +684,10 @@ class ScrollableWidget(Container):
 
         self.scroll = 0
         self.scroll_momentum = 0
+        # The scroll is a float, but we only draw whole pixels.
+        self.drawn_scroll = None
+        # The widgets that were on the screen at the last frame.
+        self.shown_widgets: List[Widget] = []
 
     @property
     def max_scroll(self):
@@ -469,8 +695,44 @@ class ScrollableWidget(Container):
             return 0
         return self.scrollable_surf.get_height() - SIZE[1]
 
+    @property
+    def visible_area(self) -> pygame.Rect:
+        """The part of the scrollable area that is on the screen, relative to the widget."""
+        return pygame.Rect((0, self.scroll), self.size)
+
+    def visible_widgets(self, area: Optional[pygame.Rect] = None) -> List[Widget]:
+        """The widgets inside [area], which is all the visible area by default."""
+        if area is None:
+            area = self.visible_area
+        return [widget for widget in self if area.colliderect(widget.rect)]
+
+    def dirty_rects(self) -> List[pygame.Rect]:
+        if self.dirty or int(self.scroll) != self.drawn_scroll:
+            return [self.rect]
+
+        area = self.visible_area
+        offset = self.position - (0, int(self.scroll))
+        rects = []
+        for widget in self.visible_widgets(area):
+            for rect in widget.dirty_rects():
+                rect = rect.clip(area)
+                if rect:
+                    rects.append(rect.move(offset))
+        return rects
+
+    def clean(self):
+        super().clean()
+        self.drawn_scroll = int(self.scroll)
+
     def logic(self):
-        super().logic()
+        # Widgets that are scrolled out of the screen are not updated.
+        visible = self.visible_widgets()
+        for widget in visible:
+            widget.logic()
+        for widget in self.shown_widgets:
+            if widget not in visible:
+                widget.hidden()
+        self.shown_widgets = visible
 
         if self.scrollable_surf is None:
             return
@@ -488,15 +750,21 @@ class ScrollableWidget(Container):
 
         self.scroll_momentum = self.scroll_momentum * t + (1 - t) * ((target - self.scroll) / 4)
 
-    def _draw(self, screen):
-        for widget in self:
+    def _draw(self, screen, area=None):
+        for widget in self.visible_widgets(area):
             widget.draw(screen)
 
     def draw(self, screen: pygame.Surface):
         if self.scrollable_surf:
-            # Draw everything on the larger surface
-            self.scrollable_surf.fill(self.bg_color)
-            self._draw(self.scrollable_surf)
+            # Draw the visible widgets on the larger surface,
+            # the rest of it is not shown anyway.
+            # If only a part of the screen is redrawn, we redraw only this part.
+            area = screen.get_clip().move(-self.position.x, self.scroll - self.position.y)
+            area = area.clip(self.visible_area)
+            self.scrollable_surf.set_clip(area)
+            self.scrollable_surf.fill(self.bg_color, area)
+            self._draw(self.scrollable_surf, area)
+            self.scrollable_surf.set_clip(None)
             screen.blit(
                 self.scrollable_surf,
                 self.position,
@@ -523,7 +791,7 @@ class ScrollableWidget(Container):
                 screen.blit(t, t.get_rect(bottomright=SIZE - pygame.Vector2(10, 10)))
 
         else:
-            self._draw(screen)
+            self._draw(screen, screen.get_clip())
 
     def handle_event(self, event):
         if super().handle_event(event):
@@ -543,3 +811,52 @@ class ScrollableWidget(Container):
             event.pos = (event.pos[0], event.pos[1] + self.scroll)
 
         return super().fix_event(event)
+
+
+class ThumbnailScheduler:
+    """
+    Decides which EmbeddedApp thumbnails can run each frame.
+
+    Apps submit what they want to do (load, or run a frame) during the logic,
+    and the scheduler runs them afterwards, the highest priority and the least
+    recently updated first, until the time budget of the frame is spent.
+    Each app is also updated at most [fps] times per second.
+    """
+
+    def __init__(self, budget=0.008, fps=30):
+        """
+        Args:
+            budget: seconds that can be spent on the thumbnails each frame.
+                At least one is always run, even if it takes longer.
+            fps: the maximum number of updates per second of each app.
+        """
+        self.budget = budget
+        self.fps = fps
+        self.last_update: Dict[EmbeddedApp, float] = {}
+        self.tasks: List[Tuple[int, EmbeddedApp, Callable]] = []
+
+    def submit(self, app: "EmbeddedApp", action: Callable, priority=0):
+        """Ask to run [action] for the app during this frame."""
+        self.tasks.append((priority, app, action))
+
+    def run(self):
+        """Run the submitted actions that fit in the budget, and forget the others."""
+        now = time.perf_counter()
+        min_delay = 1 / self.fps
+        tasks = [
+            (priority, app, action)
+            for priority, app, action in self.tasks
+            if now - self.last_update.get(app, -min_delay) >= min_delay
+        ]
+        tasks.sort(key=lambda t: (-t[0], self.last_update.get(t[1], 0)))
+        self.tasks.clear()
+
+        spent = 0
+        for priority, app, action in tasks:
+            if spent and spent >= self.budget:
+                break
+            start = time.perf_counter()
+            action()
+            end = time.perf_counter()
+            spent += end - start
+            self.last_update[app] = end
@@ -0,0 +1,220 @@
+"""
+Running entries in their own process.
+
+An EntryWorker starts a child process that imports an entry and runs its mainloop.
+The frames are drawn directly in shared memory, which is wrapped in a
+pygame.Surface on both sides with pygame.image.frombuffer, so they are never copied.
+There are two frame buffers: the child draws in one while the showcase displays
+the other, and they are swapped each time the child finishes a frame. Before
+drawing, the child copies the previous frame in its buffer, so that entries
+that don't clear the screen each frame look the same as without a process.
+The events are sent to the child through a pipe.
+
+This way, a slow entry doesn't slow down the showcase, many entries
+can run on different cores, and an entry that crashes doesn't crash the showcase.
+
+This needs Python 3.8 for multiprocessing.shared_memory.
+"""
+
+import multiprocessing
+import os
+import traceback
+from typing import List, Optional
+
+import pygame
+
+from .constants import SIZE
+from .core import Entry
+from .replay import deserialize_event, fix_time_step, seed_everything, serialize_event
+
+try:
+    from multiprocessing import shared_memory
+except ImportError:  # Python 3.7
+    shared_memory = None
+
+__all__ = ["EntryWorker", "WorkerCrashed", "WorkerExited", "workers_available"]
+
+# Pixel format of the frames in the shared memory. Both sides need to agree on it.
+PIXEL_FORMAT = "RGBX"
+BYTES_PER_PIXEL = 4
+
+
+def workers_available() -> bool:
+    """Whether entries can be run in their own process with this version of Python."""
+    return shared_memory is not None
+
+
+class WorkerCrashed(Exception):
+    """The entry raised an exception or its process died."""
+
+
+class WorkerExited(Exception):
+    """The mainloop of the entry returned."""
+
+
+def frame_buffers(memory, size=SIZE) -> List[pygame.Surface]:
+    """Wrap the two frames in the shared memory into surfaces."""
+    frame_bytes = size[0] * size[1] * BYTES_PER_PIXEL
+    buffers = [memory.buf[i * frame_bytes : (i + 1) * frame_bytes] for i in range(2)]
+    return [pygame.image.frombuffer(buffer, size, PIXEL_FORMAT) for buffer in buffers]
+
+
+def worker_main(
+    challenge: str,
+    entry: str,
+    memory_name: str,
+    connection,
+    seed: Optional[int] = None,
+    fixed_step: Optional[float] = None,
+):
+    """Entry point of the child process.
+    The seed and the fixed time step are those of the recording or replay, if any."""
+    # The child has no window, everything is drawn in the shared memory.
+    os.environ["SDL_VIDEODRIVER"] = "dummy"
+    # Otherwise SDL catches SIGTERM, and the showcase can't terminate the child.
+    os.environ["SDL_NO_SIGNAL_HANDLERS"] = "1"
+    pygame.init()
+    pygame.display.set_mode(SIZE)
+
+    if seed is not None:
+        seed_everything(seed)
+    if fixed_step:
+        fix_time_step(fixed_step)
+
+    memory = shared_memory.SharedMemory(memory_name)
+    buffers = frame_buffers(memory)
+    current = 0
+    drawn = False
+    mainloop = None
+
+    try:
+        mainloop = Entry(challenge, entry).get_mainloop()
+        next(mainloop)
+        while True:
+            message = connection.recv()
+            if message[0] == "quit":
+                break
+
+            events = [deserialize_event(e) for e in message[1]]
+            if drawn:
+                # The showcase asks for a new frame only once it displays the last one,
+                # so the buffer we draw in is not shown and we can copy the last frame in it.
+                buffers[current].blit(buffers[1 - current], (0, 0))
+            try:
+                mainloop.send((buffers[current], events))
+            except StopIteration:
+                connection.send(("exited",))
+                break
+
+            connection.send(("done", current))
+            current = 1 - current
+            drawn = True
+    except (EOFError, BrokenPipeError):
+        # The showcase is gone.
+        pass
+    except Exception as e:
+        traceback.print_exc()
+        connection.send(("crashed", f"{type(e).__name__}: {e}"))
+    finally:
+        # The shared memory can be closed only once nothing uses it anymore,
+        # and the mainloop most likely keeps a reference to the screen.
+        if mainloop is not None:
+            mainloop.close()
+        del mainloop, buffers
+        memory.close()
+
+
+class EntryWorker:
+    """Handle to an entry running in a child process."""
+
+    def __init__(self, entry: Entry, size=SIZE, seed=None, fixed_step=None):
+        """
+        Args:
+            seed: if given, random is seeded with it in the child, like EventRecorder.start().
+            fixed_step: if given, the Clocks of the child always tick this many milliseconds.
+        """
+        self.entry = entry
+        self.memory = shared_memory.SharedMemory(
+            create=True, size=2 * size[0] * size[1] * BYTES_PER_PIXEL
+        )
+        self.buffers = frame_buffers(self.memory, size)
+
+        # Spawn, and not fork, as forking a process that uses SDL is not safe.
+        context = multiprocessing.get_context("spawn")
+        self.connection, child_connection = context.Pipe()
+        self.process = context.Process(
+            target=worker_main,
+            args=(
+                entry.challenge,
+                entry.entry,
+                self.memory.name,
+                child_connection,
+                seed,
+                fixed_step,
+            ),
+            daemon=True,
+            name=f"wclib-{entry}",
+        )
+        self.process.start()
+
+        self.busy = False
+        self.pending_events = []
+
+    def update(self, events, wait=False) -> Optional[pygame.Surface]:
+        """
+        Send the events to the child, and return the last frame that it
+        finished since the previous call, or None if it is still working.
+
+        This doesn't wait for the child, unless [wait] is True. The events
+        are kept until the child is ready for the next frame, so with [wait],
+        the child gets the events of each call in a separate frame.
+
+        Raises:
+            WorkerCrashed: if the entry crashed.
+            WorkerExited: if the mainloop of the entry returned.
+        """
+        self.pending_events.extend(serialize_event(e) for e in events)
+
+        frame = None
+        if self.busy:
+            # While waiting, check regularly that the child is still alive.
+            while not self.connection.poll(0.1 if wait else 0):
+                if not self.process.is_alive():
+                    raise WorkerCrashed(f"The process exited with code {self.process.exitcode}")
+                if not wait:
+                    return None
+
+            message = self.connection.recv()
+            if message[0] == "crashed":
+                raise WorkerCrashed(message[1])
+            elif message[0] == "exited":
+                raise WorkerExited()
+
+            frame = self.buffers[message[1]]
+            self.busy = False
+
+        # The child can start the next frame right away.
+        self.connection.send(("frame", self.pending_events))
+        self.pending_events = []
+        self.busy = True
+
+        return frame
+
+    def close(self):
+        """Stop the child and free the shared memory.
+        The surfaces returned by update() must not be used afterwards."""
+        if self.process.is_alive():
+            try:
+                self.connection.send(("quit",))
+            except (BrokenPipeError, OSError):
+                pass
+            self.process.join(1)
+            if self.process.is_alive():
+                # The entry is stuck in a frame.
+                self.process.kill()
+                self.process.join()
+
+        self.connection.close()
+        del self.buffers
+        self.memory.close()
+        self.memory.unlink()